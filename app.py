@@ -1,6 +1,7 @@
 from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from flask_wtf.csrf import CSRFProtect
+from jinja2 import FileSystemBytecodeCache
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import timedelta, datetime
 from decimal import Decimal
@@ -11,8 +12,20 @@ import os
 import logging
 import boto3
 from dotenv import load_dotenv
-from boto3.dynamodb.conditions import Attr
-from mock_stocks import get_stock, search_stocks, get_all_stocks
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
+from mock_stocks import get_stock, search_stocks, get_all_stocks, subscribe_ticks, simulate_ticks, publish_ticks
+import price_history
+import movers
+from migrate_holdings import migrate_portfolio
+import txlog
+import data_access
+from structured_logging import configure_logging
+import metrics
+from rate_limit import rate_limited, admit_request, release_request
+from http_cache import conditional, page_version, quote_version
+import click
+import time
 import uuid
 
 # Load environment variables from .env file (for local development only)
@@ -25,6 +38,7 @@ app.secret_key = os.getenv('FLASK_SECRET_KEY', os.urandom(24))
 app.debug = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
 
 # Secure session configuration
+# nginx/stocker.conf bypasses its micro-cache on $cookie_stocker_session; keep the names in sync
 app.config['SESSION_COOKIE_NAME'] = os.getenv('SESSION_COOKIE_NAME', 'stocker_session')
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = os.getenv('SESSION_COOKIE_SAMESITE', 'Lax')
@@ -39,6 +53,12 @@ app.config['REMEMBER_COOKIE_DURATION'] = timedelta(
     days=int(os.getenv('REMEMBER_ME_DAYS', '14'))
 )
 
+# Templates: compiled bytecode is cached on disk and shared by every worker
+app.config['TEMPLATES_AUTO_RELOAD'] = app.debug
+TEMPLATE_CACHE_DIR = os.getenv('TEMPLATE_CACHE_DIR', os.path.join(app.root_path, 'data', 'jinja_cache'))
+os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(TEMPLATE_CACHE_DIR)
+
 # AWS Configuration
 AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
 dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
@@ -47,24 +67,79 @@ sns_client = boto3.client('sns', region_name=AWS_REGION)
 # DynamoDB Tables
 users_table = dynamodb.Table(os.getenv('DYNAMODB_USERS_TABLE', 'stocker-users'))
 portfolios_table = dynamodb.Table(os.getenv('DYNAMODB_PORTFOLIOS_TABLE', 'stocker-portfolios'))
+holdings_table = dynamodb.Table(os.getenv('DYNAMODB_HOLDINGS_TABLE', 'stocker-holdings'))
 transactions_table = dynamodb.Table(os.getenv('DYNAMODB_TRANSACTIONS_TABLE', 'stocker-transactions'))
 
 # SNS Configuration
 SNS_TOPIC_ARN = os.getenv('SNS_TOPIC_ARN', '')
 
-# Configure logging
-log_level = os.getenv('LOG_LEVEL', 'INFO')
-logging.basicConfig(
-    level=getattr(logging, log_level),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging: queue-backed, sampled, tagged with request IDs
+log_handler = configure_logging(app)
 logger = logging.getLogger(__name__)
+# Per-trade lines; sample with LOG_SAMPLE_RATES=app.trade=<rate>
+trade_logger = logging.getLogger(f"{__name__}.trade")
+
+# Transaction log: optionally journal locally and group-commit to DynamoDB
+transaction_log = None
+if os.getenv('TXLOG_WRITE_BEHIND', 'False').lower() == 'true':
+    transaction_log = txlog.TransactionLogWriter(transactions_table)
+    txlog.recover(transactions_table)
+
+# Market movers: ranked as prices tick and trades fill
+market_movers = movers.MarketMovers()
+subscribe_ticks(market_movers.on_tick)
 
 
 def _hash_token(token):
     return hashlib.sha256(token.encode('utf-8')).hexdigest()
 
 
+_static_hashes = {}
+
+
+@app.template_global()
+def static_url(filename):
+    """url_for('static') plus a content hash, so nginx's long-lived static caching stays safe"""
+    digest = _static_hashes.get(filename)
+    if digest is None or app.debug:
+        with open(os.path.join(app.static_folder, filename), 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:12]
+        _static_hashes[filename] = digest
+    return url_for('static', filename=filename, v=digest)
+
+
+def precompile_templates():
+    """Compile every template into the bytecode cache and this process's template cache"""
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+
+
+@app.cli.command('precompile-templates')
+def precompile_templates_command():
+    """Compile all templates ahead of time (run at build/deploy)"""
+    precompile_templates()
+
+
+@app.cli.command('price-feed')
+@click.option('--interval', default=1.0, help='seconds between ticks')
+def price_feed_command(interval):
+    """Run the price feed and record candles (the single price-history writer)"""
+    candle_writer = price_history.CandleWriter()
+    candle_writer.acquire()
+    # Resume from the last published quotes, then share every tick with the workers
+    publish_ticks()
+    subscribe_ticks(candle_writer.on_tick)
+    logger.info("Price feed writing candles to %s every %ss", candle_writer.base_dir, interval)
+    try:
+        while True:
+            simulate_ticks()
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        candle_writer.close()
+
+
 def _send_email_via_sns(subject, message):
     if not SNS_TOPIC_ARN:
         logger.warning("SNS_TOPIC_ARN not configured. Email content: %s | %s", subject, message)
@@ -72,7 +147,7 @@ def _send_email_via_sns(subject, message):
     try:
         sns_client.publish(TopicArn=SNS_TOPIC_ARN, Subject=subject, Message=message)
     except Exception as e:
-        logger.error(f"SNS publish error: {str(e)}")
+        logger.error("SNS publish error: %s", e)
 
 # CSRF protection for all forms
 csrf = CSRFProtect(app)
@@ -104,8 +179,7 @@ class User(UserMixin):
 
 def _get_user_by_email(email):
     try:
-        response = users_table.get_item(Key={'email': email})
-        user = response.get('Item')
+        user = _db().get(users_table, {'email': email})
         if not user:
             return None
         return User(
@@ -116,7 +190,7 @@ def _get_user_by_email(email):
             status=user.get('status', 'active')
         )
     except Exception as e:
-        logger.error(f"User lookup error: {str(e)}")
+        logger.error("User lookup error: %s", e)
         return None
 
 
@@ -124,6 +198,18 @@ def _get_user_by_email(email):
 def load_user(user_id):
     return _get_user_by_email(user_id)
 
+# Request-scoped identity map for DynamoDB reads, flushed at request end
+data_access.init_app(app)
+
+
+def _db():
+    return data_access.current_session(dynamodb)
+
+
+# Admission control: shed stale/excess requests before any view work
+app.before_request(admit_request)
+app.teardown_request(release_request)
+
 # Decorator for admin-only routes
 def admin_required(f):
     @wraps(f)
@@ -140,11 +226,13 @@ def admin_required(f):
 
 # Landing Page
 @app.route('/')
+@conditional(page_version, public=True)
 def index():
     return render_template('index.html')
 
 # Authentication Routes
 @app.route('/login', methods=['GET', 'POST'])
+@rate_limited('auth', methods=('POST',))
 def login():
     if request.method == 'POST':
         email = request.form.get('email')
@@ -153,8 +241,7 @@ def login():
         
         try:
             # Query user from DynamoDB
-            response = users_table.get_item(Key={'email': email})
-            user = response.get('Item')
+            user = _db().get(users_table, {'email': email})
             
             if user:
                 if user.get('status', 'active') != 'active':
@@ -169,18 +256,19 @@ def login():
                 if password_hash:
                     if not check_password_hash(password_hash, password):
                         flash('Invalid email or password', 'error')
-                        logger.warning(f"Failed login attempt for: {email}")
+                        logger.warning("Failed login attempt for: %s", email)
                         return render_template('login.html')
                 else:
                     # Legacy plaintext support (migrate on next successful login)
                     legacy_password = user.get('password')
                     if not legacy_password or legacy_password != password:
                         flash('Invalid email or password', 'error')
-                        logger.warning(f"Failed login attempt for: {email}")
+                        logger.warning("Failed login attempt for: %s", email)
                         return render_template('login.html')
 
                     new_hash = generate_password_hash(password, method='pbkdf2:sha256', salt_length=16)
-                    users_table.update_item(
+                    _db().defer_update(
+                        users_table,
                         Key={'email': email},
                         UpdateExpression="SET password_hash=:ph, updated_at=:ua REMOVE password",
                         ExpressionAttributeValues={
@@ -199,18 +287,19 @@ def login():
                     status=user.get('status', 'active')
                 )
                 login_user(user_obj, remember=remember)
-                logger.info(f"User logged in: {email} (Role: {user.get('role')})")
+                logger.info("User logged in: %s (Role: %s)", email, user.get('role'))
                 return redirect(url_for('dashboard'))
             else:
                 flash('Invalid email or password', 'error')
-                logger.warning(f"Failed login attempt for: {email}")
+                logger.warning("Failed login attempt for: %s", email)
         except Exception as e:
-            logger.error(f"Login error: {str(e)}")
+            logger.error("Login error: %s", e)
             flash('An error occurred during login', 'error')
     
     return render_template('login.html')
 
 @app.route('/signup', methods=['GET', 'POST'])
+@rate_limited('auth', methods=('POST',))
 def signup():
     if request.method == 'POST':
         email = request.form.get('email')
@@ -228,8 +317,7 @@ def signup():
         
         try:
             # Check if user exists
-            response = users_table.get_item(Key={'email': email})
-            if 'Item' in response:
+            if _db().get(users_table, {'email': email}):
                 flash('Email already registered', 'error')
                 return render_template('signup.html')
             
@@ -239,8 +327,6 @@ def signup():
             verification_token = secrets.token_urlsafe(32)
             verification_token_hash = _hash_token(verification_token)
             verification_sent_at = datetime.utcnow().isoformat()
-            logger.info(f"Generated verification token for {email}: {verification_token}")
-            logger.info(f"Token hash to store: {verification_token_hash}")
             users_table.put_item(Item={
                 'email': email,
                 'user_id': user_id,
@@ -269,16 +355,17 @@ def signup():
                 f"Hi {name},\n\nPlease verify your email by clicking the link below:\n{verify_link}\n\nIf you did not create this account, you can ignore this email."
             )
             
-            logger.info(f"New user registered: {email}")
+            logger.info("New user registered: %s", email)
             flash('Account created successfully. Please login.', 'success')
             return redirect(url_for('login'))
         except Exception as e:
-            logger.error(f"Signup error: {str(e)}")
+            logger.error("Signup error: %s", e)
             flash('An error occurred during signup', 'error')
     
     return render_template('signup.html')
 
 @app.route('/about')
+@conditional(page_version, public=True)
 def about():
     return render_template('about.html')
 
@@ -308,10 +395,10 @@ Message: {message}
                     Message=contact_message
                 )
             
-            logger.info(f"Contact form submitted by {email} - Subject: {subject}")
+            logger.info("Contact form submitted by %s - Subject: %s", email, subject)
             flash('Thank you for contacting us. We will respond within 24 hours.', 'success')
         except Exception as e:
-            logger.error(f"Contact form error: {str(e)}")
+            logger.error("Contact form error: %s", e)
             flash('Message received. We will get back to you soon.', 'success')
         
         return redirect(url_for('contact'))
@@ -326,6 +413,7 @@ def logout():
 
 
 @app.route('/verify-email')
+@rate_limited('auth')
 def verify_email():
     token = request.args.get('token')
     if not token:
@@ -333,15 +421,12 @@ def verify_email():
         return redirect(url_for('login'))
 
     token_hash = _hash_token(token)
-    logger.info(f"Verification attempt - Token: {token}")
-    logger.info(f"Verification attempt - Token hash: {token_hash}")
     try:
         # Scan is avoided; rely on direct lookup with token hash (requires token hash stored on user item)
         response = users_table.scan(
             FilterExpression=Attr('email_verification_token_hash').eq(token_hash)
         )
         items = response.get('Items', [])
-        logger.info(f"Scan found {len(items)} users with token hash")
         if not items:
             flash('Verification link is invalid or expired', 'error')
             return redirect(url_for('login'))
@@ -358,18 +443,18 @@ def verify_email():
         flash('Email verified. You can now log in.', 'success')
         return redirect(url_for('login'))
     except Exception as e:
-        logger.error(f"Email verification error: {str(e)}")
+        logger.error("Email verification error: %s", e)
         flash('An error occurred during verification', 'error')
         return redirect(url_for('login'))
 
 
 @app.route('/forgot-password', methods=['GET', 'POST'])
+@rate_limited('auth', methods=('POST',))
 def forgot_password():
     if request.method == 'POST':
         email = request.form.get('email')
         try:
-            response = users_table.get_item(Key={'email': email})
-            user = response.get('Item')
+            user = _db().get(users_table, {'email': email})
             if user and user.get('email_verified', False):
                 reset_token = secrets.token_urlsafe(32)
                 reset_token_hash = _hash_token(reset_token)
@@ -392,13 +477,14 @@ def forgot_password():
             flash('If the email exists, a reset link has been sent.', 'success')
             return redirect(url_for('login'))
         except Exception as e:
-            logger.error(f"Forgot password error: {str(e)}")
+            logger.error("Forgot password error: %s", e)
             flash('An error occurred. Try again later.', 'error')
 
     return render_template('forgot_password.html')
 
 
 @app.route('/reset-password', methods=['GET', 'POST'])
+@rate_limited('auth', methods=('POST',))
 def reset_password():
     token = request.args.get('token') if request.method == 'GET' else request.form.get('token')
     if not token:
@@ -443,7 +529,7 @@ def reset_password():
             flash('Password updated. You can now log in.', 'success')
             return redirect(url_for('login'))
         except Exception as e:
-            logger.error(f"Reset password error: {str(e)}")
+            logger.error("Reset password error: %s", e)
             flash('An error occurred. Try again later.', 'error')
 
     return render_template('reset_password.html', token=token)
@@ -451,6 +537,7 @@ def reset_password():
 # Dashboard Routes
 @app.route('/dashboard')
 @login_required
+@conditional(page_version)
 def dashboard():
     return render_template('dashboard.html')
 
@@ -461,16 +548,19 @@ def buy_sell():
 
 @app.route('/portfolio')
 @login_required
+@conditional(page_version)
 def portfolio():
     return render_template('portfolio.html')
 
 @app.route('/transactions')
 @login_required
+@conditional(page_version)
 def transactions():
     return render_template('transactions.html')
 
 @app.route('/settings')
 @login_required
+@conditional(page_version)
 def settings():
     return render_template('settings.html')
 
@@ -482,9 +572,18 @@ def admin():
     return render_template('admin.html')
 
 
+@app.route('/api/admin/metrics')
+@login_required
+@admin_required
+def api_admin_metrics():
+    """Get app-tier counters aggregated across workers"""
+    return jsonify(metrics.snapshot())
+
+
 # API Routes for Trading
 @app.route('/api/stocks/search')
 @login_required
+@rate_limited('search')
 def api_search_stocks():
     """Search stocks by symbol or name"""
     query = request.args.get('q', '').strip()
@@ -497,6 +596,8 @@ def api_search_stocks():
 
 @app.route('/api/stocks/<symbol>')
 @login_required
+@rate_limited('quote')
+@conditional(quote_version)
 def api_get_stock(symbol):
     """Get stock details"""
     stock = get_stock(symbol)
@@ -505,30 +606,166 @@ def api_get_stock(symbol):
     return jsonify(stock)
 
 
+@app.route('/api/stocks/<symbol>/history')
+@login_required
+@rate_limited('quote')
+def api_get_stock_history(symbol):
+    """Get OHLCV candles for a stock"""
+    stock = get_stock(symbol)
+    if not stock:
+        return jsonify({'error': 'Stock not found'}), 404
+
+    resolution = request.args.get('resolution', '1m')
+    if resolution not in price_history.RESOLUTIONS:
+        return jsonify({'error': f"Invalid resolution. Use one of: {', '.join(price_history.RESOLUTIONS)}"}), 400
+
+    step = price_history.RESOLUTIONS[resolution]
+    try:
+        end = int(request.args.get('end', time.time()))
+        start = int(request.args.get('start', end - step * price_history.DEFAULT_POINTS))
+    except ValueError:
+        return jsonify({'error': 'start and end must be unix timestamps'}), 400
+
+    if start >= end:
+        return jsonify({'error': 'start must be before end'}), 400
+    # Clamp to the most recent MAX_POINTS buckets
+    start = max(start, end - step * price_history.MAX_POINTS)
+
+    try:
+        candles = price_history.read_candles(stock['symbol'], start, end, resolution)
+    except Exception as e:
+        logger.error("Price history error: %s", e)
+        return jsonify({'error': 'Failed to fetch price history'}), 500
+
+    return jsonify({
+        'symbol': stock['symbol'],
+        'resolution': resolution,
+        'fields': ['timestamp', 'open', 'high', 'low', 'close', 'volume'],
+        'candles': candles
+    })
+
+
+@app.route('/api/market/movers')
+@login_required
+@rate_limited('quote')
+def api_market_movers():
+    """Get top gainers, losers and most-traded stocks"""
+    try:
+        limit = int(request.args.get('limit', movers.DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    if limit < 1:
+        return jsonify({'error': 'limit must be positive'}), 400
+
+    return jsonify(market_movers.snapshot(min(limit, movers.MAX_LIMIT)))
+
+
+STARTING_CASH = Decimal('10000.00')
+CENTS = Decimal('0.01')
+
+
+def _migrate_legacy_holdings(portfolio):
+    """Move a legacy holdings map to the Holdings table; True if anything was migrated"""
+    if not portfolio or 'holdings' not in portfolio:
+        return False
+    migrate_portfolio(portfolio, portfolios_table, holdings_table)
+    return True
+
+
+def _get_portfolio(user_id):
+    """Portfolio summary item, with any legacy holdings map migrated to the Holdings table"""
+    portfolio = _db().get(portfolios_table, {'user_id': user_id})
+    _migrate_legacy_holdings(portfolio)
+    return portfolio
+
+
+def _delete_empty_position(position_key):
+    """Remove a position sold down to zero; best-effort, since zero-share items are skipped on read"""
+    try:
+        holdings_table.delete_item(
+            Key=position_key,
+            ConditionExpression='shares = :zero',
+            ExpressionAttributeValues={':zero': 0}
+        )
+    except ClientError as e:
+        # Bought again in the meantime
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            logger.error("Empty position delete failed: %s", e)
+            metrics.incr('trade.position_delete_errors')
+    except Exception as e:
+        logger.error("Empty position delete failed: %s", e)
+        metrics.incr('trade.position_delete_errors')
+
+
+def _get_positions(user_id):
+    """All of a user's positions from one Holdings query: {symbol: item}"""
+    positions = {}
+    query_kwargs = {'KeyConditionExpression': Key('user_id').eq(user_id)}
+    while True:
+        response = holdings_table.query(**query_kwargs)
+        for item in response.get('Items', []):
+            # A sold-out position whose delete didn't go through
+            if item['shares'] > 0:
+                positions[item['symbol']] = item
+        if 'LastEvaluatedKey' not in response:
+            return positions
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def _create_portfolio(user_id, user_email):
+    now = datetime.utcnow().isoformat()
+    portfolio = {
+        'user_id': user_id,
+        'email': user_email,
+        'cash_balance': STARTING_CASH,
+        'total_transactions': 0,
+        'created_at': now,
+        'updated_at': now
+    }
+    try:
+        portfolios_table.put_item(Item=portfolio, ConditionExpression='attribute_not_exists(user_id)')
+    except ClientError as e:
+        # Created concurrently by another request
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        _db().forget(portfolios_table, {'user_id': user_id})
+        return _get_portfolio(user_id)
+    _db().remember(portfolios_table, {'user_id': user_id}, portfolio)
+    return portfolio
+
+
 @app.route('/api/portfolio/summary')
 @login_required
 def api_portfolio_summary():
     """Get user's portfolio summary"""
-    user_email = current_user.id
     try:
-        response = portfolios_table.get_item(Key={'user_id': current_user.user_id})
-        portfolio = response.get('Item', {})
-        
-        holdings = portfolio.get('holdings', {})
+        portfolio = _get_portfolio(current_user.user_id) or {}
+        positions = _get_positions(current_user.user_id)
         transactions = portfolio.get('total_transactions', 0)
-        
+
         return jsonify({
-            'holdings': holdings,
+            'holdings': {symbol: int(position['shares']) for symbol, position in positions.items()},
+            'positions': [
+                {
+                    'symbol': symbol,
+                    'company_name': position.get('company_name', symbol),
+                    'shares': int(position['shares']),
+                    'cost_basis': float(position['cost_basis']),
+                    'avg_cost': float(position['cost_basis'] / position['shares']) if position['shares'] else 0.0
+                }
+                for symbol, position in sorted(positions.items())
+            ],
             'total_transactions': transactions,
             'cash_balance': portfolio.get('cash_balance', 10000.00)
         })
     except Exception as e:
-        logger.error(f"Portfolio summary error: {str(e)}")
+        logger.error("Portfolio summary error: %s", e)
         return jsonify({'error': 'Failed to fetch portfolio'}), 500
 
 
 @app.route('/api/trade', methods=['POST'])
 @login_required
+@rate_limited('trade')
 def api_execute_trade():
     """Execute a buy or sell trade"""
     try:
@@ -539,84 +776,99 @@ def api_execute_trade():
         quantity = int(data.get('quantity', 0))
         order_type = data.get('order_type', 'market')
         
-        logger.info(f"Trade request: {action} {quantity} {symbol} from {current_user.id}")
+        trade_logger.debug("Trade request: %s %s %s from %s", action, quantity, symbol, current_user.id)
         
         # Validate inputs
         if not symbol or action not in ['buy', 'sell'] or quantity <= 0:
-            logger.warning(f"Invalid trade params: symbol={symbol}, action={action}, qty={quantity}")
+            logger.warning("Invalid trade params: symbol=%s, action=%s, qty=%s", symbol, action, quantity)
             return jsonify({'error': 'Invalid trade parameters'}), 400
         
         # Get stock info
         stock = get_stock(symbol)
         if not stock:
-            logger.warning(f"Stock not found: {symbol}")
+            logger.warning("Stock not found: %s", symbol)
             return jsonify({'error': 'Stock not found'}), 404
         
         price = float(stock['price'])
-        total_cost = price * quantity
+        # Money is Decimal, in cents: these amounts are ADDed to stored balances
+        total_cost = (Decimal(str(price)) * quantity).quantize(CENTS)
         user_id = current_user.user_id
         user_email = current_user.id
         
-        logger.info(f"Processing {action}: {quantity} {symbol} @ ${price} = ${total_cost}")
-        
-        # Get or create portfolio
-        portfolio_response = portfolios_table.get_item(Key={'user_id': user_id})
-        portfolio = portfolio_response.get('Item', {
-            'user_id': user_id,
-            'email': user_email,
-            'holdings': {},
-            'cash_balance': Decimal('10000.00'),
-            'total_transactions': 0,
-            'created_at': datetime.utcnow().isoformat(),
-            'updated_at': datetime.utcnow().isoformat()
-        })
-        
-        holdings = portfolio.get('holdings', {})
-        cash_balance = float(portfolio.get('cash_balance', 10000.00))
-        
-        logger.info(f"Current portfolio: holdings={holdings}, cash=${cash_balance}")
-        
+        # Get or create portfolio; portfolio and position are fetched in one batch
+        portfolio_key = {'user_id': user_id}
+        position_key = {'user_id': user_id, 'symbol': symbol}
+        portfolio, position = _db().get_many([(portfolios_table, portfolio_key), (holdings_table, position_key)])
+        if _migrate_legacy_holdings(portfolio):
+            _db().forget(holdings_table, position_key)
+            position = _db().get(holdings_table, position_key)
+        portfolio = portfolio or _create_portfolio(user_id, user_email)
+        cash_balance = Decimal(str(portfolio.get('cash_balance', STARTING_CASH)))
+        current_qty = int(position['shares']) if position else 0
+
+        now = datetime.utcnow().isoformat()
+        portfolio_update = {
+            'TableName': portfolios_table.name,
+            'Key': portfolio_key,
+            'ExpressionAttributeValues': {':one': 1, ':now': now, ':total': total_cost}
+        }
+        position_update = {
+            'TableName': holdings_table.name,
+            'Key': position_key,
+            'ExpressionAttributeValues': {':q': quantity, ':now': now}
+        }
+
         if action == 'buy':
             # Check if user has enough cash
             if cash_balance < total_cost:
-                logger.warning(f"Insufficient funds: need ${total_cost}, have ${cash_balance}")
+                logger.warning("Insufficient funds: need $%.2f, have $%.2f", total_cost, cash_balance)
                 return jsonify({'error': f'Insufficient funds. Need ${total_cost:.2f}, have ${cash_balance:.2f}'}), 400
-            
-            # Update holdings
-            current_qty = int(holdings.get(symbol, 0))
-            holdings[symbol] = str(current_qty + quantity)
+
+            # Debit cash only if it still covers the order when the write lands
+            portfolio_update['UpdateExpression'] = "SET updated_at=:now ADD cash_balance :debit, total_transactions :one"
+            portfolio_update['ConditionExpression'] = "cash_balance >= :total"
+            portfolio_update['ExpressionAttributeValues'][':debit'] = -total_cost
+            position_update['UpdateExpression'] = (
+                "SET updated_at=:now, added_at=if_not_exists(added_at, :now), company_name=if_not_exists(company_name, :name) "
+                "ADD shares :q, cost_basis :basis"
+            )
+            position_update['ExpressionAttributeValues'].update({':name': stock['name'], ':basis': total_cost})
+            remaining_qty = current_qty + quantity
             cash_balance -= total_cost
-            
+
         elif action == 'sell':
             # Check if user has enough shares
-            current_qty = int(holdings.get(symbol, 0))
             if current_qty < quantity:
-                logger.warning(f"Insufficient shares: have {current_qty}, trying to sell {quantity}")
+                logger.warning("Insufficient shares: have %s, trying to sell %s", current_qty, quantity)
                 return jsonify({'error': f'Insufficient shares. Have {current_qty}, trying to sell {quantity}'}), 400
-            
-            # Update holdings
-            holdings[symbol] = str(current_qty - quantity)
-            if holdings[symbol] == '0':
-                del holdings[symbol]
+
+            # Release cost basis pro rata; selling the whole position releases all of it
+            cost_basis = Decimal(str(position['cost_basis']))
+            basis_sold = cost_basis if quantity == current_qty else (cost_basis * quantity / current_qty).quantize(CENTS)
+            position_update['UpdateExpression'] = "SET updated_at=:now ADD shares :sold, cost_basis :basis"
+            position_update['ConditionExpression'] = "shares >= :q"
+            position_update['ExpressionAttributeValues'].update({':sold': -quantity, ':basis': -basis_sold})
+            portfolio_update['UpdateExpression'] = "SET updated_at=:now ADD cash_balance :total, total_transactions :one"
+            remaining_qty = current_qty - quantity
             cash_balance += total_cost
-        
-        logger.info(f"Updated portfolio: holdings={holdings}, cash=${cash_balance}")
-        
-        # Update portfolio in DynamoDB
-        portfolios_table.put_item(Item={
-            'user_id': user_id,
-            'email': user_email,
-            'holdings': holdings,
-            'cash_balance': Decimal(str(cash_balance)),
-            'total_transactions': int(portfolio.get('total_transactions', 0)) + 1,
-            'created_at': portfolio.get('created_at', datetime.utcnow().isoformat()),
-            'updated_at': datetime.utcnow().isoformat()
-        })
-        logger.info(f"Portfolio saved for {user_email}")
-        
+
+        # Cash and position change together or not at all
+        _db().forget(portfolios_table, portfolio_key)
+        _db().forget(holdings_table, position_key)
+        try:
+            dynamodb.meta.client.transact_write_items(TransactItems=[
+                {'Update': portfolio_update},
+                {'Update': position_update}
+            ])
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'TransactionCanceledException':
+                raise
+            logger.warning("Trade condition failed for %s: %s %s %s", user_email, action, quantity, symbol)
+            return jsonify({'error': 'Insufficient funds' if action == 'buy' else 'Insufficient shares'}), 400
+
         # Record transaction
         transaction_id = str(uuid.uuid4())
-        transactions_table.put_item(Item={
+        transaction = {
             'transaction_id': transaction_id,
             'user_id': user_id,
             'email': user_email,
@@ -624,13 +876,27 @@ def api_execute_trade():
             'action': action,
             'quantity': quantity,
             'price': Decimal(str(price)),
-            'total': Decimal(str(total_cost)),
+            'total': total_cost,
             'order_type': order_type,
             'status': 'completed',
             'timestamp': datetime.utcnow().isoformat()
-        })
-        logger.info(f"Transaction recorded: {transaction_id}")
-        logger.info(f"Trade executed: {user_email} - {action.upper()} {quantity} {symbol} @ ${price}")
+        }
+        if transaction_log:
+            transaction_log.submit(transaction)
+        else:
+            transactions_table.put_item(Item=transaction)
+        # Leaderboards are advisory: never fail a committed trade over them
+        try:
+            market_movers.record_fill(symbol, quantity)
+        except Exception as e:
+            logger.error("Movers fill update failed: %s", e)
+            metrics.incr('movers.fill_errors')
+        if remaining_qty == 0:
+            _delete_empty_position(position_key)
+        trade_logger.info(
+            "Trade executed: %s - %s %s %s @ $%s (txn %s, position %s, cash $%.2f)",
+            user_email, action.upper(), quantity, symbol, price, transaction_id, remaining_qty, cash_balance
+        )
         
         return jsonify({
             'success': True,
@@ -640,13 +906,13 @@ def api_execute_trade():
                 'symbol': symbol,
                 'quantity': quantity,
                 'price': price,
-                'total': total_cost,
-                'cash_balance': cash_balance
+                'total': float(total_cost),
+                'cash_balance': float(cash_balance)
             }
         })
         
     except Exception as e:
-        logger.error(f"Trade execution error: {str(e)}")
+        logger.error("Trade execution error: %s", e)
         return jsonify({'error': 'Trade failed. Please try again.'}), 500
 
 
@@ -666,8 +932,12 @@ def api_get_transactions():
         items.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
         return jsonify(items)
     except Exception as e:
-        logger.error(f"Fetch transactions error: {str(e)}")
+        logger.error("Fetch transactions error: %s", e)
         return jsonify({'error': 'Failed to fetch transactions'}), 500
 
+# Compile templates at startup: from the bytecode cache this is a cheap load,
+# and with GUNICORN_PRELOAD it happens once in the master before workers fork.
+precompile_templates()
+
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,102 @@
+"""Per-request logging overhead: synchronous f-string logging vs. structured_logging.
+
+Usage:
+    python benchmarks/bench_logging.py [--requests 20000]
+
+"before" replays the old trade path: seven f-string INFO lines per trade
+(one with the whole holdings dict) through a StreamHandler, formatted and
+written in the request thread. "after" replays the current trade path: one
+%-style INFO line plus one DEBUG line (disabled) on app.trade through the
+queue-backed handler, with and without sampling. "sync, same calls" runs
+those same call sites through a plain StreamHandler with the same JSON
+formatter, so the queue/sampling effect can be read apart from the effect of
+logging less. Output goes to a temporary file, as stderr does under gunicorn.
+"""
+
+import argparse
+import logging
+import os
+import queue
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from structured_logging import JsonFormatter, RequestQueueHandler, SamplingFilter
+
+HOLDINGS = {symbol: str(qty) for symbol, qty in zip(
+    ['AAPL', 'GOOGL', 'MSFT', 'AMZN', 'TSLA', 'META', 'NVDA', 'NFLX'], range(10, 90, 10))}
+
+
+def _reset(handler):
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+        existing.close()
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+
+
+def old_trade(logger, i):
+    action, quantity, symbol, price, cash = 'buy', 10, 'AAPL', 178.42, 8215.80
+    user = 'bench@example.com'
+    logger.info(f"Trade request: {action} {quantity} {symbol} from {user}")
+    logger.info(f"Processing {action}: {quantity} {symbol} @ ${price} = ${price * quantity}")
+    logger.info(f"Current portfolio: holdings={HOLDINGS}, cash=${cash}")
+    logger.info(f"Updated portfolio: holdings={HOLDINGS}, cash=${cash - price * quantity}")
+    logger.info(f"Portfolio saved for {user}")
+    logger.info(f"Transaction recorded: txn-{i}")
+    logger.info(f"Trade executed: {user} - {action.upper()} {quantity} {symbol} @ ${price}")
+
+
+def new_trade(logger, i):
+    action, quantity, symbol, price, cash = 'buy', 10, 'AAPL', 178.42, 8215.80
+    user = 'bench@example.com'
+    logger.debug("Trade request: %s %s %s from %s", action, quantity, symbol, user)
+    logger.info(
+        "Trade executed: %s - %s %s %s @ $%s (txn %s, position %s, cash $%.2f)",
+        user, action.upper(), quantity, symbol, price, f"txn-{i}", 80, cash
+    )
+
+
+def run(label, trade, logger, requests, drain=None):
+    started = time.perf_counter()
+    for i in range(requests):
+        trade(logger, i)
+    in_request = time.perf_counter() - started
+    if drain:
+        drain()
+    total = time.perf_counter() - started
+    print(f"{label:<28} in-request {in_request / requests * 1e6:7.2f} us/req   incl. background drain {total / requests * 1e6:7.2f} us/req")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+    out = open(os.path.join(tempfile.mkdtemp(prefix='stocker-bench-log-'), 'stderr.log'), 'w')
+
+    handler = logging.StreamHandler(out)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    _reset(handler)
+    run('before (sync, 7 f-strings)', old_trade, logging.getLogger('app'), args.requests)
+
+    handler = logging.StreamHandler(out)
+    handler.setFormatter(JsonFormatter())
+    _reset(handler)
+    run('sync, same calls (json)', new_trade, logging.getLogger('app.trade'), args.requests)
+
+    for rate in (1.0, 0.1):
+        output = logging.StreamHandler(out)
+        output.setFormatter(JsonFormatter())
+        handler = RequestQueueHandler(queue.SimpleQueue(), [output])
+        handler.addFilter(SamplingFilter({'app.trade': rate}))
+        _reset(handler)
+        run(f"after (queue, sample {rate:g})", new_trade, logging.getLogger('app.trade'), args.requests, drain=handler.close)
+
+    out.close()
+
+
+if __name__ == '__main__':
+    main()
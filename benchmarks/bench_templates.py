@@ -0,0 +1,66 @@
+"""Template compile/render benchmark.
+
+Usage:
+    python benchmarks/bench_templates.py [--iterations 200]
+
+For every template prints the cold compile time (no bytecode cache), the load
+time from the bytecode cache, render latency (p50/p95) and rendered size.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import render_template
+from jinja2 import FileSystemBytecodeCache
+
+from app import app
+
+
+def _timed(fn):
+    started = time.perf_counter()
+    fn()
+    return (time.perf_counter() - started) * 1000
+
+
+def _load_ms(name, bytecode_cache):
+    # Fresh environment so neither the template nor its parents are memoized
+    env = app.create_jinja_environment()
+    env.bytecode_cache = bytecode_cache
+    return _timed(lambda: env.get_template(name))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    names = sorted(n for n in app.jinja_env.list_templates() if n.endswith('.html'))
+    bytecode_cache = FileSystemBytecodeCache(tempfile.mkdtemp(prefix='stocker-bench-'))
+    for name in names:
+        _load_ms(name, bytecode_cache)
+
+    print(f"{'template':<22} {'compile ms':>10} {'bytecode ms':>11} {'render p50 us':>13} {'render p95 us':>13} {'bytes':>7}")
+    for name in names:
+        compile_ms = _load_ms(name, None)
+        cached_ms = _load_ms(name, bytecode_cache)
+
+        with app.test_request_context('/'):
+            html = render_template(name, token='benchmark')
+            samples = []
+            for _ in range(args.iterations):
+                started = time.perf_counter()
+                render_template(name, token='benchmark')
+                samples.append((time.perf_counter() - started) * 1e6)
+        samples.sort()
+        p95 = samples[int(len(samples) * 0.95) - 1]
+        print(f"{name:<22} {compile_ms:>10.2f} {cached_ms:>11.2f} {statistics.median(samples):>13.1f} {p95:>13.1f} {len(html.encode('utf-8')):>7}")
+
+
+if __name__ == '__main__':
+    main()
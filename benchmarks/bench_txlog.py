@@ -0,0 +1,129 @@
+"""Transaction log benchmark: synchronous put_item vs. write-behind group commit.
+
+Usage:
+    python benchmarks/bench_txlog.py [--trades 2000] [--threads 8] [--write-latency-ms 8]
+
+DynamoDB is simulated by a table whose every PutItem / BatchWriteItem call
+sleeps --write-latency-ms, so the numbers show the shape of the trade-off
+(per-trade acknowledgement latency and records/s), not absolute AWS figures.
+The write-behind journal is real and fsync'd in a temporary directory.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('STOCKER_SHM_DIR', tempfile.mkdtemp(prefix='stocker-bench-shm-'))
+
+import txlog
+
+
+class SimulatedTable:
+    """Stands in for a boto3 Table: each network call costs a fixed latency"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.items = 0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _call(self, items):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            self.items += items
+
+    def put_item(self, Item):
+        self._call(1)
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        table = self
+
+        class _Batch:
+            def __init__(self):
+                self.buffer = []
+
+            def __enter__(self):
+                return self
+
+            def put_item(self, Item):
+                self.buffer.append(Item)
+                if len(self.buffer) == 25:
+                    table._call(len(self.buffer))
+                    self.buffer = []
+
+            def __exit__(self, *exc):
+                if self.buffer:
+                    table._call(len(self.buffer))
+
+        return _Batch()
+
+
+def _record():
+    return {
+        'transaction_id': str(uuid.uuid4()),
+        'user_id': 'user#1',
+        'email': 'bench@example.com',
+        'symbol': 'AAPL',
+        'action': 'buy',
+        'quantity': 10,
+        'price': Decimal('178.42'),
+        'total': Decimal('1784.20'),
+        'order_type': 'market',
+        'status': 'completed',
+        'timestamp': '2026-01-28T14:32:00'
+    }
+
+
+def run(label, write, table, trades, threads, wait_for_flush=None):
+    latencies = []
+    lock = threading.Lock()
+
+    def trade(_):
+        record = _record()
+        started = time.perf_counter()
+        write(record)
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            latencies.append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(trade, range(trades)))
+    acked = time.perf_counter() - started
+    if wait_for_flush:
+        wait_for_flush()
+    durable = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"{label:<14} ack p50 {statistics.median(latencies):7.2f} ms  p99 {latencies[int(len(latencies) * 0.99) - 1]:7.2f} ms  "
+          f"acked {trades / acked:8.0f} rec/s  in DynamoDB {table.items / durable:8.0f} rec/s  calls {table.calls}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trades', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--write-latency-ms', type=float, default=8.0)
+    args = parser.parse_args()
+    latency = args.write_latency_ms / 1000
+
+    table = SimulatedTable(latency)
+    run('synchronous', lambda r: table.put_item(Item=r), table, args.trades, args.threads)
+
+    table = SimulatedTable(latency)
+    writer = txlog.TransactionLogWriter(table, journal_dir=tempfile.mkdtemp(prefix='stocker-bench-txlog-'))
+    run('write-behind', writer.submit, table, args.trades, args.threads, wait_for_flush=writer.close)
+
+
+if __name__ == '__main__':
+    main()
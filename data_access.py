@@ -0,0 +1,147 @@
+# Request-scoped DynamoDB access
+#
+# Every request gets a DataSession (an identity map) that:
+#   - returns the same item for repeated gets of one key, so load_user, the view
+#     and any helpers it calls share a single GetItem;
+#   - fetches independent keys requested together with one BatchGetItem;
+#   - queues non-critical writes (defer_update) and sends them when the request
+#     ends, after the response has been built.
+#
+# Writes that must be visible or conditional right away (trades) still go
+# straight to DynamoDB; call forget() afterwards so later reads see the change.
+#
+# Per-request read counts are exported as data.reads_requested (gets asked for:
+# what the app used to issue) vs. data.reads_issued (GetItem/BatchGetItem calls
+# actually made), alongside data.requests.
+
+import logging
+import random
+import time
+
+from flask import g, has_request_context
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+BATCH_GET_MAX_KEYS = 100
+# UnprocessedKeys (throttling) are retried with jittered exponential backoff
+BATCH_GET_MAX_RETRIES = 5
+BATCH_GET_BACKOFF_SECONDS = 0.05
+
+
+def _identity(table, key):
+    return (table.name, tuple(sorted(key.items())))
+
+
+class DataSession:
+    """Identity map and deferred write queue for one request"""
+
+    def __init__(self, dynamodb, defer_writes=True):
+        self.dynamodb = dynamodb
+        self.defer_writes = defer_writes
+        self._items = {}
+        self._writes = []
+        self.reads_requested = 0
+        self.reads_issued = 0
+
+    def get(self, table, key):
+        """Return the item for key (None if absent), fetching it at most once per request"""
+        return self.get_many([(table, key)])[0]
+
+    def get_many(self, requests):
+        """Return items for [(table, key), ...] in order; misses are fetched in one batch"""
+        self.reads_requested += len(requests)
+        missing = {}
+        for table, key in requests:
+            identity = _identity(table, key)
+            if identity not in self._items:
+                missing[identity] = (table, key)
+
+        if len(missing) == 1:
+            (identity, (table, key)), = missing.items()
+            self._items[identity] = table.get_item(Key=key).get('Item')
+            self.reads_issued += 1
+        elif missing:
+            self._batch_get(list(missing.values()))
+
+        return [self._items[_identity(table, key)] for table, key in requests]
+
+    def _batch_get(self, requests):
+        tables = {table.name: table for table, _ in requests}
+        for start in range(0, len(requests), BATCH_GET_MAX_KEYS):
+            chunk = requests[start:start + BATCH_GET_MAX_KEYS]
+            request_items = {}
+            key_names = {}
+            for table, key in chunk:
+                request_items.setdefault(table.name, {'Keys': []})['Keys'].append(key)
+                key_names[table.name] = list(key)
+
+            attempt = 0
+            while request_items:
+                if attempt:
+                    if attempt > BATCH_GET_MAX_RETRIES:
+                        # Unfetched keys must not be mistaken for missing items
+                        raise RuntimeError(f"BatchGetItem left keys unprocessed after {BATCH_GET_MAX_RETRIES} retries")
+                    metrics.incr('data.batch_get_retries')
+                    time.sleep(random.uniform(0, BATCH_GET_BACKOFF_SECONDS * 2 ** (attempt - 1)))
+                response = self.dynamodb.batch_get_item(RequestItems=request_items)
+                self.reads_issued += 1
+                attempt += 1
+                for table_name, items in response.get('Responses', {}).items():
+                    for item in items:
+                        key = {name: item[name] for name in key_names[table_name]}
+                        self._items[_identity(tables[table_name], key)] = item
+                request_items = response.get('UnprocessedKeys') or {}
+            # Only once every key was processed is an absent item known to be missing
+            for table, key in chunk:
+                self._items.setdefault(_identity(table, key), None)
+
+    def remember(self, table, key, item):
+        """Record an item this request just wrote, so later gets don't re-read it"""
+        self._items[_identity(table, key)] = item
+
+    def forget(self, table, key):
+        """Drop a cached item after writing it directly"""
+        self._items.pop(_identity(table, key), None)
+
+    def defer_update(self, table, **kwargs):
+        """Queue table.update_item(**kwargs) until the end of the request"""
+        self.forget(table, kwargs['Key'])
+        if not self.defer_writes:
+            table.update_item(**kwargs)
+            return
+        self._writes.append((table, kwargs))
+
+    def flush(self):
+        """Send queued writes; a failed write is logged and does not stop the rest"""
+        writes, self._writes = self._writes, []
+        for table, kwargs in writes:
+            try:
+                table.update_item(**kwargs)
+            except Exception as e:
+                logger.error("Deferred write to %s failed: %s", table.name, e)
+                metrics.incr('data.deferred_write_errors')
+
+
+def init_app(app):
+    """Flush each request's DataSession at teardown and record its read counts"""
+    @app.teardown_request
+    def _close_data_session(exc=None):
+        data_session = g.pop('data_session', None)
+        if data_session is None:
+            return
+        if exc is None:
+            data_session.flush()
+        metrics.incr('data.requests')
+        metrics.incr('data.reads_requested', data_session.reads_requested)
+        metrics.incr('data.reads_issued', data_session.reads_issued)
+
+
+def current_session(dynamodb):
+    """The request's DataSession; outside a request, a throwaway one that writes immediately"""
+    if not has_request_context():
+        return DataSession(dynamodb, defer_writes=False)
+    if 'data_session' not in g:
+        g.data_session = DataSession(dynamodb)
+    return g.data_session
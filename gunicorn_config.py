@@ -14,6 +14,8 @@ worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
 worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
 timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
 keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '2'))
+# Load the app (and precompile templates) once in the master before forking workers
+preload_app = os.getenv('GUNICORN_PRELOAD', 'false').lower() == 'true'
 
 # Server mechanics
 daemon = False
@@ -25,7 +27,9 @@ tmp_upload_dir = None
 
 # Logging
 accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
-access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s" %(D)s'
+# Last field is the request ID the app echoes on every response (nginx's
+# $request_id, or one the app generated), also attached to every app log line
+access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s" %(D)s %({x-request-id}o)s'
 errorlog = os.getenv('GUNICORN_ERROR_LOG', '-')
 loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
 
@@ -35,7 +39,9 @@ proc_name = 'stocker'
 # Server hooks
 def on_starting(server):
     """Called before the master process is initialized."""
-    pass
+    # Shared state outlives the master; drop in-flight counts left by a previous one
+    import rate_limit
+    rate_limit.reset()
 
 def on_exit(server):
     """Called just after the server stops."""
@@ -47,4 +53,18 @@ def pre_fork(server, worker):
 
 def post_fork(server, worker):
     """Called just after a worker has been forked."""
-    pass
+    # Replay journals of workers that died without flushing (e.g. SIGKILL on timeout)
+    import txlog
+    txlog.recover_all()
+
+def worker_exit(server, worker):
+    """Called in the worker just after it exits."""
+    # Flush write-behind transaction records so the journal can be removed
+    import txlog
+    txlog.close_all()
+
+def child_exit(server, worker):
+    """Called in the master after a worker exits."""
+    # Free the dead worker's in-flight slot so admission control doesn't leak capacity
+    from rate_limit import release_worker
+    release_worker(worker.pid)
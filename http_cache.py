@@ -0,0 +1,115 @@
+# HTTP conditional caching
+#
+# Views decorated with @conditional get a strong ETag derived from a cheap
+# content version (template/static build hash, quote tick sequence) instead of
+# from the rendered body. A matching If-None-Match is answered with 304 before
+# the view runs, so neither the template render nor the JSON serialization happens.
+#
+# Public pages additionally carry X-Accel-Expires so nginx can micro-cache them
+# (see nginx/stocker.conf); authenticated responses are private and vary on the
+# session cookie, and their ETag includes the user so it never matches across
+# accounts.
+
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, make_response, request
+from flask_login import current_user
+
+import metrics
+from mock_stocks import get_stock, get_tick_seq
+
+MICROCACHE_SECONDS = int(os.getenv('HTTP_MICROCACHE_SECONDS', '5'))
+
+# Body size last sent per ETag, to report bytes saved by 304s (per worker)
+_BODY_SIZES_MAX = 4096
+_body_sizes = OrderedDict()
+_template_version = None
+
+
+def template_version():
+    """Hash of all template and static sources; changes only when a deploy touches them"""
+    global _template_version
+    if _template_version is None:
+        digest = hashlib.sha256()
+        # Pages embed content-hashed static URLs, so static files are part of the version
+        for folder in (os.path.join(current_app.root_path, current_app.template_folder), current_app.static_folder):
+            for root, dirs, files in os.walk(folder):
+                dirs.sort()
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    digest.update(os.path.relpath(path, folder).encode('utf-8'))
+                    with open(path, 'rb') as f:
+                        digest.update(f.read())
+        _template_version = digest.hexdigest()[:16]
+    return _template_version
+
+
+def page_version(*args, **kwargs):
+    """Version for views that render a template with no per-request data"""
+    return template_version()
+
+
+def quote_version(symbol):
+    """Version for a stock quote: bumps on every applied tick"""
+    stock = get_stock(symbol)
+    if not stock:
+        return None
+    return f"{stock['symbol']}:{get_tick_seq(symbol)}:{stock['price']}"
+
+
+def _remember_size(etag, size):
+    _body_sizes[etag] = size
+    _body_sizes.move_to_end(etag)
+    if len(_body_sizes) > _BODY_SIZES_MAX:
+        _body_sizes.popitem(last=False)
+
+
+def _set_cache_headers(response, public):
+    if public:
+        response.headers['Cache-Control'] = 'public, max-age=0, must-revalidate'
+        if MICROCACHE_SECONDS:
+            response.headers['X-Accel-Expires'] = str(MICROCACHE_SECONDS)
+    else:
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Cookie')
+
+
+def conditional(version_fn, public=False):
+    """Answer If-None-Match with 304 when version_fn(*view_args) is unchanged"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            started = time.perf_counter()
+            version = version_fn(*args, **kwargs)
+            if version is None:
+                return f(*args, **kwargs)
+
+            parts = [request.endpoint, str(version)]
+            if not public:
+                parts.append(current_user.get_id() or '')
+            etag = hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()[:32]
+
+            # Weak comparison (RFC 7232): nginx gzip turns proxied ETags into W/"..."
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+                metrics.incr(f"http.{request.endpoint}.not_modified")
+                metrics.incr(f"http.{request.endpoint}.bytes_saved", _body_sizes.get(etag, 0))
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                _remember_size(etag, response.calculate_content_length() or 0)
+
+            response.set_etag(etag)
+            _set_cache_headers(response, public)
+            metrics.observe(
+                f"http.{request.endpoint}.{response.status_code}.latency_ms",
+                (time.perf_counter() - started) * 1000
+            )
+            return response
+        return decorated_function
+    return decorator
@@ -0,0 +1,58 @@
+# Shared application counters
+#
+# Named float counters aggregated across all gunicorn workers. Each slot holds a
+# fixed-width name and a value; names are placed by hash with linear probing.
+# Exported through /api/admin/metrics.
+
+import hashlib
+import struct
+
+from shared_state import SharedFile, shm_path
+
+SLOTS = 1024
+SLOT = struct.Struct('<56sd')
+MAX_PROBE = 32
+
+_store = SharedFile(shm_path('stocker-metrics'), SLOTS * SLOT.size)
+
+
+def _home_slot(encoded):
+    return int.from_bytes(hashlib.blake2b(encoded, digest_size=4).digest(), 'little') % SLOTS
+
+
+def incr(name, amount=1):
+    """Add amount to the named counter"""
+    encoded = name.encode('utf-8')[:SLOT.size - 8]
+    padded = encoded.ljust(SLOT.size - 8, b'\0')
+    home = _home_slot(encoded)
+    with _store.locked() as buf:
+        for probe in range(MAX_PROBE):
+            offset = ((home + probe) % SLOTS) * SLOT.size
+            slot_name, value = SLOT.unpack_from(buf, offset)
+            if slot_name == padded or slot_name[0] == 0:
+                SLOT.pack_into(buf, offset, padded, value + amount)
+                return
+    # Table full around this name: drop the sample rather than block a request.
+
+
+def observe(name, value):
+    """Record one sample of a timing or size: keeps <name>.count and <name>.sum"""
+    incr(f"{name}.count")
+    incr(f"{name}.sum", value)
+
+
+def snapshot(prefix=''):
+    """Return {name: value} for every counter starting with prefix"""
+    counters = {}
+    with _store.locked() as buf:
+        for slot_name, value in SLOT.iter_unpack(buf):
+            if slot_name[0] == 0:
+                continue
+            name = slot_name.rstrip(b'\0').decode('utf-8', 'replace')
+            if name.startswith(prefix):
+                counters[name] = value
+    return counters
+
+
+def reset():
+    _store.reset()
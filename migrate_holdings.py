@@ -0,0 +1,154 @@
+# Holdings migration
+#
+# Portfolios used to store positions as a `holdings` map of symbol -> stringified
+# quantity on the portfolio item. Positions now live in the Holdings table, one
+# item per (user_id, symbol) with numeric `shares` and `cost_basis`.
+#
+# The legacy map never recorded what was paid, so migrated positions use the
+# current quote as their cost basis and are flagged with cost_basis_estimated.
+#
+# Safe to re-run and to run while the app is serving (the app also migrates a
+# portfolio lazily when it reads it). Positions are written in the same
+# TransactWriteItems call that removes their symbols from the map, conditioned on
+# those symbols still being there, so exactly one migration claims each position:
+# a concurrent one can't resurrect shares that were sold in the meantime.
+#
+# Usage:
+#     python migrate_holdings.py [--dry-run]
+
+import argparse
+import logging
+import os
+from datetime import datetime
+from decimal import Decimal
+
+import boto3
+from botocore.exceptions import ClientError
+from dotenv import load_dotenv
+
+from mock_stocks import get_stock
+
+logger = logging.getLogger(__name__)
+
+
+# One item of each transaction is the portfolio update that claims the chunk
+TRANSACT_MAX_ITEMS = 100
+
+
+def _position_item(user_id, symbol, quantity, added_at, now):
+    shares = int(quantity)
+    if shares <= 0:
+        return None
+    stock = get_stock(symbol)
+    price = Decimal(str(stock['price'])) if stock else Decimal('0')
+    return {
+        'user_id': user_id,
+        'symbol': symbol,
+        'shares': shares,
+        'cost_basis': price * shares,
+        'cost_basis_estimated': True,
+        'company_name': stock['name'] if stock else symbol,
+        'added_at': added_at,
+        'updated_at': now
+    }
+
+
+def _claim(user_id, symbols, items, remove_all, portfolios_table, holdings_table, now):
+    """Write items and remove symbols from the map atomically; None if another migration claimed them"""
+    names = {f"#s{index}": symbol for index, symbol in enumerate(symbols)}
+    condition = ' AND '.join(['attribute_exists(holdings)'] + [f"attribute_exists(holdings.{name})" for name in names])
+    removed = 'holdings' if remove_all else ', '.join(f"holdings.{name}" for name in names)
+    claim = {
+        'TableName': portfolios_table.name,
+        'Key': {'user_id': user_id},
+        'UpdateExpression': f"SET updated_at=:ua REMOVE {removed}",
+        'ConditionExpression': condition,
+        'ExpressionAttributeValues': {':ua': now}
+    }
+    if names:
+        claim['ExpressionAttributeNames'] = names
+
+    existing = set()
+    while True:
+        puts = [
+            {'Put': {'TableName': holdings_table.name, 'Item': item, 'ConditionExpression': 'attribute_not_exists(symbol)'}}
+            for item in items if item['symbol'] not in existing
+        ]
+        try:
+            portfolios_table.meta.client.transact_write_items(TransactItems=[{'Update': claim}] + puts)
+            return len(puts)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'TransactionCanceledException':
+                raise
+            reasons = e.response.get('CancellationReasons') or []
+            if not reasons or reasons[0].get('Code') == 'ConditionalCheckFailed':
+                return None
+            # Positions left by an interrupted run of the old, non-atomic migration: keep them
+            conflicts = {
+                put['Put']['Item']['symbol']
+                for put, reason in zip(puts, reasons[1:]) if reason.get('Code') == 'ConditionalCheckFailed'
+            }
+            if not conflicts:
+                raise
+            existing |= conflicts
+
+
+def migrate_portfolio(portfolio, portfolios_table, holdings_table, dry_run=False):
+    """Move one portfolio's legacy holdings map into Holdings items; returns positions written"""
+    holdings = portfolio.get('holdings')
+    if holdings is None:
+        return 0
+
+    user_id = portfolio['user_id']
+    now = datetime.utcnow().isoformat()
+    added_at = portfolio.get('created_at', now)
+    symbols = list(holdings)
+    chunk_size = TRANSACT_MAX_ITEMS - 1
+    written = 0
+    for start in range(0, max(len(symbols), 1), chunk_size):
+        chunk = symbols[start:start + chunk_size]
+        items = [item for item in (_position_item(user_id, symbol, holdings[symbol], added_at, now) for symbol in chunk) if item]
+        if dry_run:
+            for item in items:
+                logger.info("[dry-run] %s %s: %d shares", user_id, item['symbol'], item['shares'])
+            written += len(items)
+            continue
+        remove_all = start + chunk_size >= len(symbols)
+        claimed = _claim(user_id, chunk, items, remove_all, portfolios_table, holdings_table, now)
+        if claimed is None:
+            # Migrated concurrently by another request or run
+            break
+        written += claimed
+
+    if not dry_run:
+        portfolio.pop('holdings', None)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert map-based portfolio holdings into Holdings table items')
+    parser.add_argument('--dry-run', action='store_true', help='log what would be written without writing')
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    dynamodb = boto3.resource('dynamodb', region_name=os.getenv('AWS_REGION', 'us-east-1'))
+    portfolios_table = dynamodb.Table(os.getenv('DYNAMODB_PORTFOLIOS_TABLE', 'stocker-portfolios'))
+    holdings_table = dynamodb.Table(os.getenv('DYNAMODB_HOLDINGS_TABLE', 'stocker-holdings'))
+
+    portfolios = positions = 0
+    scan_kwargs = {'FilterExpression': 'attribute_exists(holdings)'}
+    while True:
+        response = portfolios_table.scan(**scan_kwargs)
+        for portfolio in response.get('Items', []):
+            positions += migrate_portfolio(portfolio, portfolios_table, holdings_table, dry_run=args.dry_run)
+            portfolios += 1
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    logger.info("Migrated %d portfolios, %d positions%s", portfolios, positions, ' (dry run)' if args.dry_run else '')
+
+
+if __name__ == '__main__':
+    main()
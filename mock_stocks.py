@@ -1,6 +1,13 @@
 # Mock stock data for testing
 # In production, replace with real API (Alpha Vantage, IEX Cloud, etc.)
 
+import random
+import struct
+import threading
+import time
+
+from shared_state import SharedFile, shm_path
+
 MOCK_STOCKS = {
     'AAPL': {
         'symbol': 'AAPL',
@@ -111,11 +118,13 @@ MOCK_STOCKS = {
 
 def get_stock(symbol):
     """Get stock data by symbol"""
+    sync_quotes()
     return MOCK_STOCKS.get(symbol.upper())
 
 
 def search_stocks(query):
     """Search stocks by symbol or name"""
+    sync_quotes()
     query = query.upper()
     results = []
     
@@ -128,4 +137,138 @@ def search_stocks(query):
 
 def get_all_stocks():
     """Get all available stocks"""
+    sync_quotes()
     return list(MOCK_STOCKS.values())
+
+
+# Tick feed
+# A price source (poller, websocket client, replay job) pushes updates through
+# apply_tick(); consumers such as the candle writer register with subscribe_ticks().
+# Until a real source is wired in, `flask price-feed` drives simulate_ticks().
+#
+# The feed runs in its own process, so it publishes every tick to a shared-memory
+# quote table (publish_ticks). Other processes (gunicorn workers) replay the
+# quotes that changed since they last looked whenever they read stock data
+# (sync_quotes), which also runs their tick listeners: quotes, trade prices,
+# movers and ETags all follow the feed.
+
+_tick_listeners = []
+_tick_seq = {}
+
+
+def subscribe_ticks(callback):
+    """Register callback(symbol, price, volume, timestamp) for every applied tick"""
+    _tick_listeners.append(callback)
+
+
+def get_tick_seq(symbol):
+    """Number of ticks applied to a stock"""
+    sync_quotes()
+    return _tick_seq.get(symbol.upper(), 0)
+
+
+def apply_tick(symbol, price, volume=0, timestamp=None):
+    """Apply a price update to a stock and notify tick listeners"""
+    stock = MOCK_STOCKS.get(symbol.upper())
+    if not stock:
+        return None
+
+    if timestamp is None:
+        timestamp = time.time()
+
+    previous_close = stock['price'] - stock['change']
+    stock['price'] = round(price, 2)
+    stock['high'] = max(stock['high'], stock['price'])
+    stock['low'] = min(stock['low'], stock['price'])
+    stock['change'] = round(stock['price'] - previous_close, 2)
+    stock['change_percent'] = round(stock['change'] / previous_close * 100, 2) if previous_close else 0.0
+    _tick_seq[stock['symbol']] = _tick_seq.get(stock['symbol'], 0) + 1
+    _notify(stock, volume, timestamp)
+    return stock
+
+
+def _notify(stock, volume, timestamp):
+    for callback in _tick_listeners:
+        callback(stock['symbol'], stock['price'], volume, timestamp)
+
+
+def simulate_ticks(volatility=0.001):
+    """Apply one random-walk tick to every stock"""
+    for symbol, stock in list(MOCK_STOCKS.items()):
+        apply_tick(symbol, stock['price'] * (1 + random.gauss(0, volatility)), random.randint(1, 500))
+
+
+QUOTES_HEADER = struct.Struct('<Q')  # ticks published
+QUOTE = struct.Struct('<16sQdddddd')  # symbol, tick seq, price, high, low, change, change_percent, timestamp
+TICK = struct.Struct('<QI')  # publish sequence, quote slot
+QUOTE_SLOTS = 4096
+TICK_RING_SLOTS = 16384
+
+_TICKS_OFFSET = QUOTES_HEADER.size
+_QUOTES_OFFSET = _TICKS_OFFSET + TICK_RING_SLOTS * TICK.size
+_quotes = SharedFile(shm_path('stocker-quotes'), _QUOTES_OFFSET + QUOTE_SLOTS * QUOTE.size)
+_quote_slots = {symbol: index for index, symbol in enumerate(MOCK_STOCKS)}
+_sync_lock = threading.RLock()
+_seen_quote_seq = 0
+
+
+def _encode_symbol(symbol):
+    return symbol.encode('ascii')[:16].ljust(16, b'\0')
+
+
+def _publish(symbol, price, volume, timestamp):
+    global _seen_quote_seq
+    stock = MOCK_STOCKS[symbol]
+    index = _quote_slots[symbol]
+    with _sync_lock, _quotes.locked() as buf:
+        seq = QUOTES_HEADER.unpack_from(buf, 0)[0] + 1
+        QUOTE.pack_into(
+            buf, _QUOTES_OFFSET + index * QUOTE.size, _encode_symbol(symbol), _tick_seq[symbol],
+            stock['price'], stock['high'], stock['low'], stock['change'], stock['change_percent'], timestamp
+        )
+        TICK.pack_into(buf, _TICKS_OFFSET + (seq % TICK_RING_SLOTS) * TICK.size, seq, index)
+        QUOTES_HEADER.pack_into(buf, 0, seq)
+        # Already applied here
+        _seen_quote_seq = seq
+
+
+def publish_ticks():
+    """Share every tick applied in this process with all other processes (the price feed)"""
+    sync_quotes()
+    subscribe_ticks(_publish)
+
+
+def sync_quotes():
+    """Apply quotes published by the price feed since this process last looked"""
+    global _seen_quote_seq
+    # Fast path without the file lock; a torn read only sends us down the slow path
+    if QUOTES_HEADER.unpack_from(_quotes.buf, 0)[0] == _seen_quote_seq:
+        return
+    with _sync_lock:
+        with _quotes.locked() as buf:
+            seq = QUOTES_HEADER.unpack_from(buf, 0)[0]
+            if seq == _seen_quote_seq:
+                return
+            slots = None
+            if _seen_quote_seq < seq <= _seen_quote_seq + TICK_RING_SLOTS:
+                slots = set()
+                for expected in range(_seen_quote_seq + 1, seq + 1):
+                    tick_seq, index = TICK.unpack_from(buf, _TICKS_OFFSET + (expected % TICK_RING_SLOTS) * TICK.size)
+                    if tick_seq != expected:
+                        slots = None
+                        break
+                    slots.add(index)
+            if slots is None:
+                # Fell a ring behind (or the table was reset): take every quote
+                slots = _quote_slots.values()
+            quotes = [QUOTE.unpack_from(buf, _QUOTES_OFFSET + index * QUOTE.size) for index in sorted(slots)]
+            _seen_quote_seq = seq
+
+        # Listeners may read stocks again; the sequence is already current, so that returns at once
+        for encoded, ticks, price, high, low, change, change_percent, timestamp in quotes:
+            stock = MOCK_STOCKS.get(encoded.rstrip(b'\0').decode('ascii'))
+            if not stock or ticks == _tick_seq.get(stock['symbol'], 0):
+                continue
+            stock.update(price=price, high=high, low=low, change=change, change_percent=change_percent)
+            _tick_seq[stock['symbol']] = ticks
+            _notify(stock, 0, timestamp)
@@ -0,0 +1,181 @@
+# Market movers
+#
+# Leaderboards for top gainers / losers (by change_percent) and most-traded
+# symbols (by shares filled today, UTC), kept sorted as prices tick and trades
+# fill so /api/market/movers reads the top K in O(K) instead of sorting the
+# whole universe per request.
+#
+# Price rankings follow the price feed: its ticks reach each worker through
+# mock_stocks' shared quote table and re-rank symbols via the tick listener.
+# Fills happen in whichever gunicorn worker served the trade, so each fill is
+# also appended to a shared-memory log: per-symbol daily totals plus a ring of
+# recent fills. Workers replay only the fills they haven't seen yet before
+# answering, and rebuild from the totals if they fell more than a ring behind.
+
+import hashlib
+import struct
+import threading
+import time
+from bisect import bisect_left, insort
+
+from mock_stocks import get_all_stocks, get_stock, sync_quotes
+from shared_state import SharedFile, shm_path
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+HEADER = struct.Struct('<QQ')  # last fill sequence, UTC day number
+FILL = struct.Struct('<Q16sd')  # sequence, symbol, shares
+TOTAL = struct.Struct('<16sd')  # symbol, shares filled today
+RING_SLOTS = 65536
+SYMBOL_SLOTS = 16384
+
+_RING_OFFSET = HEADER.size
+_TOTALS_OFFSET = _RING_OFFSET + RING_SLOTS * FILL.size
+_fills = SharedFile(shm_path('stocker-fills'), _TOTALS_OFFSET + SYMBOL_SLOTS * TOTAL.size)
+
+
+class Leaderboard:
+    """Symbols kept sorted by score; top/bottom K read in O(K)"""
+
+    def __init__(self):
+        self._entries = []
+        self._scores = {}
+
+    def score(self, symbol, default=0):
+        return self._scores.get(symbol, default)
+
+    def update(self, symbol, score):
+        old = self._scores.get(symbol)
+        if old is not None:
+            del self._entries[bisect_left(self._entries, (old, symbol))]
+        insort(self._entries, (score, symbol))
+        self._scores[symbol] = score
+
+    def top(self, k, above=None):
+        """Highest k entries, stopping at the first score not greater than `above`"""
+        result = []
+        for score, symbol in reversed(self._entries):
+            if len(result) >= k or (above is not None and score <= above):
+                break
+            result.append((symbol, score))
+        return result
+
+    def bottom(self, k, below=None):
+        """Lowest k entries, stopping at the first score not less than `below`"""
+        result = []
+        for score, symbol in self._entries:
+            if len(result) >= k or (below is not None and score >= below):
+                break
+            result.append((symbol, score))
+        return result
+
+    def clear(self):
+        self._entries = []
+        self._scores = {}
+
+
+def _today():
+    return int(time.time() // 86400)
+
+
+def _encode_symbol(symbol):
+    return symbol.encode('ascii')[:16].ljust(16, b'\0')
+
+
+def _add_total(buf, encoded, shares):
+    home = int.from_bytes(hashlib.blake2b(encoded, digest_size=4).digest(), 'little') % SYMBOL_SLOTS
+    for probe in range(SYMBOL_SLOTS):
+        offset = _TOTALS_OFFSET + ((home + probe) % SYMBOL_SLOTS) * TOTAL.size
+        slot_symbol, total = TOTAL.unpack_from(buf, offset)
+        if slot_symbol == encoded or slot_symbol[0] == 0:
+            TOTAL.pack_into(buf, offset, encoded, total + shares)
+            return
+
+
+class MarketMovers:
+    """Incrementally maintained gainers, losers and most-traded leaderboards"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._change = Leaderboard()
+        self._volume = Leaderboard()
+        self._seen_seq = 0
+        self._seen_day = None
+        for stock in get_all_stocks():
+            self._change.update(stock['symbol'], stock['change_percent'])
+
+    def on_tick(self, symbol, price, volume=0, timestamp=None):
+        """Tick listener: re-rank the symbol by its new change_percent"""
+        stock = get_stock(symbol)
+        if stock:
+            with self._lock:
+                self._change.update(stock['symbol'], stock['change_percent'])
+
+    def record_fill(self, symbol, shares):
+        """Publish a trade fill to every worker's most-traded board"""
+        encoded = _encode_symbol(symbol)
+        day = _today()
+        with _fills.locked() as buf:
+            seq, stored_day = HEADER.unpack_from(buf, 0)
+            if stored_day != day:
+                buf[:] = bytes(len(buf))
+                seq = 0
+            _add_total(buf, encoded, shares)
+            seq += 1
+            FILL.pack_into(buf, _RING_OFFSET + (seq % RING_SLOTS) * FILL.size, seq, encoded, shares)
+            HEADER.pack_into(buf, 0, seq, day)
+
+    def _sync_fills(self):
+        # Caller holds self._lock
+        with _fills.locked() as buf:
+            seq, stored_day = HEADER.unpack_from(buf, 0)
+            if stored_day != _today():
+                # No fills yet today
+                self._volume.clear()
+                self._seen_seq, self._seen_day = 0, _today()
+                return
+            if stored_day != self._seen_day or seq < self._seen_seq or seq - self._seen_seq > RING_SLOTS:
+                self._rebuild_volume(buf)
+            else:
+                for expected in range(self._seen_seq + 1, seq + 1):
+                    fill_seq, encoded, shares = FILL.unpack_from(buf, _RING_OFFSET + (expected % RING_SLOTS) * FILL.size)
+                    if fill_seq != expected:
+                        self._rebuild_volume(buf)
+                        break
+                    symbol = encoded.rstrip(b'\0').decode('ascii')
+                    self._volume.update(symbol, self._volume.score(symbol) + shares)
+            self._seen_seq, self._seen_day = seq, stored_day
+
+    def _rebuild_volume(self, buf):
+        self._volume.clear()
+        for index in range(SYMBOL_SLOTS):
+            encoded, total = TOTAL.unpack_from(buf, _TOTALS_OFFSET + index * TOTAL.size)
+            if encoded[0]:
+                self._volume.update(encoded.rstrip(b'\0').decode('ascii'), total)
+
+    def snapshot(self, limit=DEFAULT_LIMIT):
+        """Top `limit` gainers (up today), losers (down today) and most-traded symbols"""
+        # Outside self._lock: replayed ticks re-rank through on_tick
+        sync_quotes()
+        with self._lock:
+            self._sync_fills()
+            gainers = self._change.top(limit, above=0)
+            losers = self._change.bottom(limit, below=0)
+            most_traded = self._volume.top(limit)
+
+        def quote(symbol):
+            stock = get_stock(symbol)
+            return {
+                'symbol': stock['symbol'],
+                'name': stock['name'],
+                'price': stock['price'],
+                'change': stock['change'],
+                'change_percent': stock['change_percent']
+            }
+
+        return {
+            'gainers': [quote(symbol) for symbol, _ in gainers],
+            'losers': [quote(symbol) for symbol, _ in losers],
+            'most_traded': [dict(quote(symbol), traded_shares=int(shares)) for symbol, shares in most_traded]
+        }
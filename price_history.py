@@ -0,0 +1,245 @@
+# OHLCV candle history store
+#
+# Candles are kept on disk as fixed-width little-endian records, one append-only
+# file per symbol and stored resolution:
+#
+#     <HISTORY_DIR>/<resolution>/<SYMBOL>.ohlcv
+#
+# Readers memory-map the file, binary-search the requested time range and walk
+# the records in place, so worker memory stays flat no matter how much history
+# is stored. The writer keeps the currently open candle for each symbol in memory
+# and appends it once its bucket rolls over. Open candles are also written at
+# shutdown; after a restart within the same bucket the writer resumes that last
+# record and overwrites it in place when the bucket closes.
+#
+# There must be a single writer per HISTORY_DIR: the `flask price-feed` process,
+# which owns the tick feed. A CandleWriter takes an exclusive lock on the
+# directory and refuses to write without it. Any number of gunicorn workers can
+# read concurrently.
+
+import mmap
+import os
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines: no cross-process writer lock
+    fcntl = None
+
+HISTORY_DIR = os.getenv('PRICE_HISTORY_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'history'))
+
+# timestamp (bucket start, unix seconds), open, high, low, close, volume
+RECORD = struct.Struct('<qddddd')
+
+RESOLUTIONS = {
+    '1m': 60,
+    '5m': 300,
+    '1h': 3600,
+    '1d': 86400,
+}
+
+# Resolutions written to disk. Other resolutions are downsampled at read time
+# from the coarsest stored resolution that divides them evenly, which bounds the
+# number of records touched per response to MAX_POINTS * 24.
+STORED_RESOLUTIONS = ('1m', '1h')
+
+DEFAULT_POINTS = 300
+MAX_POINTS = 1000
+
+WRITER_LOCK = '.writer.lock'
+
+
+def _candle_path(symbol, resolution, base_dir=None):
+    return os.path.join(base_dir or HISTORY_DIR, resolution, f"{symbol.upper()}.ohlcv")
+
+
+def _source_resolution(resolution):
+    step = RESOLUTIONS[resolution]
+    stored = [r for r in STORED_RESOLUTIONS if step % RESOLUTIONS[r] == 0]
+    return max(stored, key=lambda r: RESOLUTIONS[r])
+
+
+def _first_index_at_or_after(buf, count, timestamp):
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if RECORD.unpack_from(buf, mid * RECORD.size)[0] < timestamp:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _downsample(view, step):
+    candles = []
+    current = None
+    for ts, o, h, l, c, v in RECORD.iter_unpack(view):
+        bucket = ts - ts % step
+        if current is None or current[0] != bucket:
+            current = [bucket, o, h, l, c, v]
+            candles.append(current)
+        else:
+            if h > current[2]:
+                current[2] = h
+            if l < current[3]:
+                current[3] = l
+            current[4] = c
+            current[5] += v
+    return candles
+
+
+def read_candles(symbol, start, end, resolution='1m', base_dir=None):
+    """Return [timestamp, open, high, low, close, volume] candles with start <= timestamp < end"""
+    step = RESOLUTIONS[resolution]
+    start -= start % step
+    path = _candle_path(symbol, _source_resolution(resolution), base_dir)
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return []
+
+    with f:
+        # A reader can race the writer's append; ignore a trailing partial record.
+        count = os.fstat(f.fileno()).st_size // RECORD.size
+        if count == 0:
+            return []
+        with mmap.mmap(f.fileno(), count * RECORD.size, access=mmap.ACCESS_READ) as mm:
+            lo = _first_index_at_or_after(mm, count, start)
+            hi = _first_index_at_or_after(mm, count, end)
+            view = memoryview(mm)[lo * RECORD.size:hi * RECORD.size]
+            try:
+                return _downsample(view, step)
+            finally:
+                view.release()
+
+
+class CandleWriter:
+    """Aggregate ticks into candles and append closed candles to the store"""
+
+    def __init__(self, base_dir=None):
+        self.base_dir = base_dir or HISTORY_DIR
+        self._open = {}
+        self._last_written = {}
+        self._files = {}
+        self._lock = threading.Lock()
+        self._owner = None
+        # Last record found on disk per key, and resumed candles' offsets
+        self._stored_tail = {}
+        self._rewrite = {}
+
+    def acquire(self):
+        """Take exclusive ownership of base_dir; raises RuntimeError if another writer holds it"""
+        os.makedirs(self.base_dir, exist_ok=True)
+        owner = open(os.path.join(self.base_dir, WRITER_LOCK), 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(owner.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                owner.close()
+                raise RuntimeError(f"Another process is already writing price history to {self.base_dir}")
+        self._owner = owner
+
+    def on_tick(self, symbol, price, volume=0, timestamp=None):
+        """Fold one trade/quote update into the open candles for symbol"""
+        if timestamp is None:
+            timestamp = time.time()
+        ts = int(timestamp)
+        with self._lock:
+            for resolution in STORED_RESOLUTIONS:
+                step = RESOLUTIONS[resolution]
+                bucket = ts - ts % step
+                key = (symbol, resolution)
+                candle = self._open.get(key)
+
+                if candle is not None and bucket > candle[0]:
+                    self._append(key, candle)
+                    candle = None
+
+                if candle is None:
+                    last = self._last_bucket(key)
+                    # The last stored candle is still open: a previous run flushed
+                    # it at shutdown. Resume it and rewrite it in place when it closes.
+                    if bucket == last and key in self._stored_tail:
+                        offset, stored = self._stored_tail.pop(key)
+                        self._rewrite[key] = offset
+                        candle = self._open[key] = list(stored)
+                    # Files must stay sorted; late ticks for a closed bucket are dropped.
+                    elif bucket <= last:
+                        continue
+                    else:
+                        self._stored_tail.pop(key, None)
+                        self._open[key] = [bucket, price, price, price, price, float(volume)]
+                        continue
+
+                if bucket == candle[0]:
+                    candle[2] = max(candle[2], price)
+                    candle[3] = min(candle[3], price)
+                    candle[4] = price
+                    candle[5] += volume
+
+    def flush(self):
+        """Append every open candle, e.g. at shutdown"""
+        with self._lock:
+            for key, candle in list(self._open.items()):
+                self._append(key, candle)
+            for f in self._files.values():
+                f.flush()
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            for f in self._files.values():
+                f.close()
+            self._files.clear()
+            if self._owner is not None:
+                self._owner.close()
+                self._owner = None
+
+    def _last_bucket(self, key):
+        if key not in self._last_written:
+            last = -1
+            path = _candle_path(key[0], key[1], self.base_dir)
+            try:
+                with open(path, 'rb') as f:
+                    count = os.fstat(f.fileno()).st_size // RECORD.size
+                    if count:
+                        offset = (count - 1) * RECORD.size
+                        f.seek(offset)
+                        stored = RECORD.unpack(f.read(RECORD.size))
+                        last = stored[0]
+                        self._stored_tail[key] = (offset, stored)
+            except FileNotFoundError:
+                pass
+            self._last_written[key] = last
+        return self._last_written[key]
+
+    def _append(self, key, candle):
+        if self._owner is None:
+            raise RuntimeError("CandleWriter.acquire() must succeed before writing candles")
+        f = self._files.get(key)
+        if f is None:
+            path = _candle_path(key[0], key[1], self.base_dir)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Drop a torn record left by a crash so every record stays aligned.
+            if os.path.exists(path):
+                size = os.path.getsize(path)
+                if size % RECORD.size:
+                    os.truncate(path, size - size % RECORD.size)
+            f = open(path, 'ab')
+            self._files[key] = f
+        offset = self._rewrite.pop(key, None)
+        if offset is None:
+            f.write(RECORD.pack(*candle))
+            f.flush()
+        else:
+            # Overwrite rather than truncate: readers may have the file mapped.
+            # Not through f: pwrite on an O_APPEND descriptor appends on Linux.
+            fd = os.open(_candle_path(key[0], key[1], self.base_dir), os.O_WRONLY)
+            try:
+                os.pwrite(fd, RECORD.pack(*candle), offset)
+            finally:
+                os.close(fd)
+        self._last_written[key] = candle[0]
+        self._open.pop(key, None)
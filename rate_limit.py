@@ -0,0 +1,223 @@
+# Per-user admission control
+#
+# nginx limits by client IP; this module limits by account. Every route class
+# (trade, quote, search, auth) has a token bucket per user, stored in a shared
+# memory table so all gunicorn workers draw from the same bucket. A global
+# admission check sheds requests early with 503 + Retry-After when the app tier
+# is saturated, instead of letting them queue into the gunicorn timeout.
+#
+# Limits are configured per route class as "<tokens per second>/<burst>":
+#     RATE_LIMIT_TRADE=2/10
+
+import hashlib
+import math
+import os
+import struct
+import time
+from functools import wraps
+
+from flask import g, jsonify, make_response, request
+from flask_login import current_user
+
+import metrics
+from shared_state import SharedFile, shm_path
+
+DEFAULT_LIMITS = {
+    'trade': '2/10',
+    'quote': '20/60',
+    'search': '5/20',
+    'auth': '0.2/5',
+    # Every auth form from one address, whichever account it names
+    'auth_ip': '1/30',
+}
+
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+
+# Requests that waited longer than this in the socket backlog / nginx (measured
+# from the X-Request-Start header nginx sets) are shed before doing any work.
+MAX_QUEUE_MS = int(os.getenv('ADMISSION_MAX_QUEUE_MS', '5000'))
+# Requests in flight across all workers (only reachable with threaded or async
+# gunicorn worker classes; sync workers are bounded by the worker count).
+MAX_INFLIGHT = int(os.getenv('ADMISSION_MAX_INFLIGHT', '64'))
+SHED_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', '2'))
+
+WORKER_SLOTS = 128
+WORKER = struct.Struct('<II')  # pid, in-flight requests
+BUCKET_SLOTS = 65536
+BUCKET = struct.Struct('<Qdd')  # key hash, tokens, last refill (unix seconds)
+MAX_PROBE = 8
+
+_BUCKETS_OFFSET = WORKER_SLOTS * WORKER.size
+_store = SharedFile(shm_path('stocker-ratelimit'), _BUCKETS_OFFSET + BUCKET_SLOTS * BUCKET.size)
+
+
+def _parse_limit(value):
+    rate, burst = value.split('/')
+    return float(rate), float(burst)
+
+
+LIMITS = {
+    route_class: _parse_limit(os.getenv(f"RATE_LIMIT_{route_class.upper()}", default))
+    for route_class, default in DEFAULT_LIMITS.items()
+}
+
+
+def _bucket_key(route_class, identity):
+    digest = hashlib.blake2b(f"{route_class}:{identity}".encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+
+def take_token(route_class, identity, now=None):
+    """Consume one token; returns (allowed, seconds until a token is available)"""
+    rate, burst = LIMITS[route_class]
+    if now is None:
+        now = time.time()
+    key = _bucket_key(route_class, identity)
+    home = key % BUCKET_SLOTS
+
+    with _store.locked() as buf:
+        victim = None
+        for probe in range(MAX_PROBE):
+            offset = _BUCKETS_OFFSET + ((home + probe) % BUCKET_SLOTS) * BUCKET.size
+            slot_key, tokens, updated = BUCKET.unpack_from(buf, offset)
+            if slot_key == key:
+                tokens = min(burst, tokens + (now - updated) * rate)
+                break
+            if slot_key == 0:
+                tokens = burst
+                break
+            # Reuse the stalest entry in the probe window; a long-idle bucket
+            # would have refilled to its burst anyway.
+            if victim is None or updated < victim[1]:
+                victim = (offset, updated)
+        else:
+            offset = victim[0]
+            tokens = burst
+
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        BUCKET.pack_into(buf, offset, key, tokens, now)
+
+    if allowed:
+        return True, 0.0
+    return False, (1 - tokens) / rate
+
+
+def _buckets(route_class):
+    """(route class, identity) buckets a request draws a token from"""
+    if current_user.is_authenticated:
+        return [(route_class, f"user:{current_user.id}")]
+    ip = request.headers.get('X-Real-IP', request.remote_addr)
+    # Auth forms: one bucket per account per address, so users behind a shared
+    # NAT don't throttle each other, plus a looser bucket per address so one
+    # client can't cycle through emails (signup, reset mails, password spraying).
+    email = request.form.get('email', '').strip().lower() if request.method == 'POST' else ''
+    if route_class == 'auth' and email:
+        return [('auth', f"email:{email}|ip:{ip}"), ('auth_ip', f"ip:{ip}")]
+    return [(route_class, f"ip:{ip}")]
+
+
+def _shed_response(status, retry_after, message):
+    if request.path.startswith('/api/'):
+        response = jsonify({'error': message})
+    else:
+        response = make_response(message)
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def rate_limited(route_class, methods=None):
+    """Apply the per-user token bucket for route_class (optionally only to some HTTP methods)"""
+    if route_class not in LIMITS:
+        raise ValueError(f"Unknown route class: {route_class}")
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if RATE_LIMIT_ENABLED and (methods is None or request.method in methods):
+                for bucket_class, identity in _buckets(route_class):
+                    allowed, retry_after = take_token(bucket_class, identity)
+                    if not allowed:
+                        metrics.incr(f"shed.{bucket_class}.rate_limited")
+                        return _shed_response(429, retry_after, 'Too many requests. Please slow down.')
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+def _adjust_inflight(buf, delta):
+    """Change this worker's in-flight count and return the total across workers"""
+    pid = os.getpid()
+    own = None
+    total = 0
+    for index in range(WORKER_SLOTS):
+        offset = index * WORKER.size
+        slot_pid, inflight = WORKER.unpack_from(buf, offset)
+        if slot_pid == pid:
+            own = (offset, inflight)
+        elif slot_pid:
+            total += inflight
+        elif own is None and delta > 0:
+            own = (offset, 0)
+    if own is None:
+        return total
+    inflight = max(0, own[1] + delta)
+    WORKER.pack_into(buf, own[0], pid if inflight else 0, inflight)
+    return total + inflight
+
+
+def _queue_ms():
+    # nginx: proxy_set_header X-Request-Start "t=${msec}";  (seconds.millis)
+    header = request.headers.get('X-Request-Start', '')
+    if not header.startswith('t='):
+        return None
+    try:
+        return (time.time() - float(header[2:])) * 1000
+    except ValueError:
+        return None
+
+
+def admit_request():
+    """before_request hook: shed stale or excess requests with a fast 503"""
+    if not RATE_LIMIT_ENABLED or request.endpoint == 'static':
+        return None
+
+    queued = _queue_ms()
+    if queued is not None and queued > MAX_QUEUE_MS:
+        metrics.incr('shed.global.queue_timeout')
+        return _shed_response(503, SHED_RETRY_AFTER, 'Service busy. Please retry shortly.')
+
+    with _store.locked() as buf:
+        if _adjust_inflight(buf, 1) > MAX_INFLIGHT:
+            _adjust_inflight(buf, -1)
+            shed = True
+        else:
+            shed = False
+            g.admitted = True
+    if shed:
+        metrics.incr('shed.global.concurrency')
+        return _shed_response(503, SHED_RETRY_AFTER, 'Service busy. Please retry shortly.')
+    return None
+
+
+def release_request(exc=None):
+    """teardown_request hook: release the in-flight slot taken by admit_request"""
+    if g.pop('admitted', False):
+        with _store.locked() as buf:
+            _adjust_inflight(buf, -1)
+
+
+def release_worker(pid):
+    """Clear a dead worker's in-flight slot (called from gunicorn's child_exit hook)"""
+    with _store.locked() as buf:
+        for index in range(WORKER_SLOTS):
+            offset = index * WORKER.size
+            if WORKER.unpack_from(buf, offset)[0] == pid:
+                WORKER.pack_into(buf, offset, 0, 0)
+
+
+def reset():
+    """Clear all buckets and in-flight counts (gunicorn on_starting: slots of a killed master's workers)"""
+    _store.reset()
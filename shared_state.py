@@ -0,0 +1,71 @@
+# Cross-worker shared state
+#
+# Gunicorn workers are separate processes, so anything that must be shared
+# between them (rate-limit buckets, counters) lives in a small fixed-size file
+# under /dev/shm that every worker memory-maps. Writers serialize on an flock.
+#
+# The file is opened lazily per process: flock locks belong to the open file
+# description, which a forked child would otherwise share with its parent.
+
+import mmap
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines: per-process locking only
+    fcntl = None
+
+SHM_DIR = os.getenv('STOCKER_SHM_DIR', '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir())
+
+
+def shm_path(name):
+    return os.path.join(SHM_DIR, name)
+
+
+class SharedFile:
+    """Fixed-size, zero-initialised file mapped into every worker"""
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        self._pid = None
+        self._fd = None
+        self._map = None
+        self._thread_lock = threading.Lock()
+
+    @property
+    def buf(self):
+        if self._pid != os.getpid():
+            self._open()
+        return self._map
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size < self.size:
+            os.ftruncate(fd, self.size)
+        self._fd = fd
+        self._map = mmap.mmap(fd, self.size)
+        self._thread_lock = threading.Lock()
+        self._pid = os.getpid()
+
+    @contextmanager
+    def locked(self):
+        """Hold the cross-process lock and yield the mapped buffer"""
+        buf = self.buf
+        with self._thread_lock:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield buf
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def reset(self):
+        """Zero the whole file"""
+        with self.locked() as buf:
+            buf[:] = bytes(self.size)
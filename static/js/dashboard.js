@@ -0,0 +1,89 @@
+// Portfolio Chart
+const ctx = document.getElementById('portfolioChart');
+
+const gradient = ctx.getContext('2d').createLinearGradient(0, 0, 0, 400);
+gradient.addColorStop(0, 'rgba(34, 197, 94, 0.1)');
+gradient.addColorStop(1, 'rgba(34, 197, 94, 0)');
+
+new Chart(ctx, {
+    type: 'line',
+    data: {
+        labels: ['Jan 1', 'Jan 5', 'Jan 10', 'Jan 15', 'Jan 20', 'Jan 25', 'Jan 28'],
+        datasets: [{
+            label: 'Portfolio Value',
+            data: [135000, 137200, 136800, 139500, 141200, 140800, 142847.92],
+            borderColor: '#22c55e',
+            backgroundColor: gradient,
+            borderWidth: 2,
+            pointRadius: 0,
+            pointHoverRadius: 6,
+            pointHoverBackgroundColor: '#22c55e',
+            pointHoverBorderColor: '#fff',
+            pointHoverBorderWidth: 2,
+            fill: true,
+            tension: 0.4
+        }]
+    },
+    options: {
+        responsive: true,
+        maintainAspectRatio: false,
+        plugins: {
+            legend: {
+                display: false
+            },
+            tooltip: {
+                mode: 'index',
+                intersect: false,
+                backgroundColor: '#18181b',
+                titleColor: '#e4e4e7',
+                bodyColor: '#a1a1aa',
+                borderColor: '#27272a',
+                borderWidth: 1,
+                padding: 12,
+                displayColors: false,
+                callbacks: {
+                    label: function(context) {
+                        return '$' + context.parsed.y.toLocaleString('en-US', {
+                            minimumFractionDigits: 2,
+                            maximumFractionDigits: 2
+                        });
+                    }
+                }
+            }
+        },
+        scales: {
+            x: {
+                grid: {
+                    color: '#27272a',
+                    drawBorder: false
+                },
+                ticks: {
+                    color: '#71717a',
+                    font: {
+                        size: 11
+                    }
+                }
+            },
+            y: {
+                grid: {
+                    color: '#27272a',
+                    drawBorder: false
+                },
+                ticks: {
+                    color: '#71717a',
+                    font: {
+                        size: 11
+                    },
+                    callback: function(value) {
+                        return '$' + (value / 1000) + 'k';
+                    }
+                }
+            }
+        },
+        interaction: {
+            mode: 'nearest',
+            axis: 'x',
+            intersect: false
+        }
+    }
+});
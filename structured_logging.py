@@ -0,0 +1,148 @@
+# Structured, non-blocking logging
+#
+# Request threads only build a LogRecord and put it on an in-memory queue; a
+# listener thread does the formatting (JSON by default) and the write to stderr.
+# Messages use %-style arguments so nothing is formatted for records that are
+# filtered out or sampled away.
+#
+# High-volume INFO lines can be sampled per logger, e.g.
+#     LOG_SAMPLE_RATES=app.trade=0.1,app.quote=0.01
+# keeps 10% / 1% of INFO-and-below records from those loggers (and their
+# children). WARNING and above are always kept.
+#
+# Every record carries the request ID that nginx sends as X-Request-ID (also
+# logged by gunicorn's access log), so app lines and access lines correlate.
+
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s'
+
+
+def _parse_sample_rates(value):
+    rates = {}
+    for entry in filter(None, (part.strip() for part in value.split(','))):
+        name, rate = entry.split('=')
+        rates[name.strip()] = float(rate)
+    return rates
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'msg': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of INFO-and-below records per logger name prefix"""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+        self._cache = {}
+
+    def _rate(self, name):
+        rate = self._cache.get(name)
+        if rate is None:
+            rate = 1.0
+            prefix = name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition('.')[0]
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class RequestQueueHandler(QueueHandler):
+    """Enqueue records unformatted, tagged with the current request ID"""
+
+    def __init__(self, log_queue, handlers):
+        super().__init__(log_queue)
+        self._handlers = handlers
+        self._listener = None
+        self._pid = None
+
+    def prepare(self, record):
+        # The stdlib version formats here, in the request thread; defer that to the listener.
+        if has_request_context():
+            record.request_id = g.get('request_id', '-')
+        else:
+            record.request_id = '-'
+        return record
+
+    def emit(self, record):
+        # Listener threads don't survive fork: start one per process
+        if self._pid != os.getpid():
+            self._start_listener()
+        super().emit(record)
+
+    def _start_listener(self):
+        self._pid = os.getpid()
+        self._listener = QueueListener(self.queue, *self._handlers, respect_handler_level=True)
+        self._listener.start()
+
+    def close(self):
+        # Drain the queue; logging.shutdown() calls this at interpreter exit
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+            self._pid = None
+        super().close()
+
+
+def configure_logging(app):
+    """Route all logging through a sampled, queue-backed handler and tag requests with IDs"""
+    level = getattr(logging, os.getenv('LOG_LEVEL', 'INFO'))
+    if os.getenv('LOG_FORMAT', 'json').lower() == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(TEXT_FORMAT)
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(formatter)
+    handler = RequestQueueHandler(queue.SimpleQueue(), [output])
+    handler.addFilter(SamplingFilter(_parse_sample_rates(os.getenv('LOG_SAMPLE_RATES', ''))))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    @app.before_request
+    def _assign_request_id():
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+
+    @app.after_request
+    def _echo_request_id(response):
+        response.headers['X-Request-ID'] = g.get('request_id', '')
+        return response
+
+    return handler
@@ -0,0 +1,98 @@
+"""Market movers leaderboards.
+
+Run with: python -m unittest discover tests
+"""
+
+import copy
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import mock_stocks
+import movers
+from shared_state import SharedFile
+
+
+class LeaderboardTest(unittest.TestCase):
+
+    def setUp(self):
+        self.board = movers.Leaderboard()
+        for symbol, score in [('AAA', 2.5), ('BBB', -1.0), ('CCC', 0.0), ('DDD', 0.7), ('EEE', -3.2)]:
+            self.board.update(symbol, score)
+
+    def test_top_and_bottom_are_ordered(self):
+        self.assertEqual(self.board.top(2), [('AAA', 2.5), ('DDD', 0.7)])
+        self.assertEqual(self.board.bottom(2), [('EEE', -3.2), ('BBB', -1.0)])
+
+    def test_sign_bounds_stop_at_wrong_sign(self):
+        self.assertEqual(self.board.top(10, above=0), [('AAA', 2.5), ('DDD', 0.7)])
+        self.assertEqual(self.board.bottom(10, below=0), [('EEE', -3.2), ('BBB', -1.0)])
+
+    def test_update_moves_existing_symbol(self):
+        self.board.update('EEE', 4.0)
+        self.assertEqual(self.board.top(1), [('EEE', 4.0)])
+        self.assertEqual(self.board.bottom(10, below=0), [('BBB', -1.0)])
+
+
+class MarketMoversTest(unittest.TestCase):
+
+    def setUp(self):
+        self.shm_dir = tempfile.mkdtemp(prefix='stocker-test-')
+        patchers = [
+            mock.patch.object(movers, '_fills', SharedFile(os.path.join(self.shm_dir, 'stocker-fills'), movers._fills.size)),
+            mock.patch.object(mock_stocks, '_quotes', SharedFile(os.path.join(self.shm_dir, 'stocker-quotes'), mock_stocks._quotes.size)),
+            mock.patch.object(mock_stocks, '_seen_quote_seq', 0),
+            mock.patch.object(mock_stocks, '_tick_listeners', []),
+            mock.patch.dict(mock_stocks._tick_seq, clear=True),
+            mock.patch.dict(mock_stocks.MOCK_STOCKS, copy.deepcopy(mock_stocks.MOCK_STOCKS)),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_all_stocks_up_means_no_losers(self):
+        stocks = [
+            {'symbol': 'UPA', 'name': 'Up A', 'price': 10.0, 'change': 1.0, 'change_percent': 11.11},
+            {'symbol': 'UPB', 'name': 'Up B', 'price': 20.0, 'change': 0.2, 'change_percent': 1.01},
+        ]
+        by_symbol = {stock['symbol']: stock for stock in stocks}
+        with mock.patch.object(movers, 'get_all_stocks', return_value=stocks), \
+                mock.patch.object(movers, 'get_stock', side_effect=by_symbol.get):
+            snapshot = movers.MarketMovers().snapshot(10)
+        self.assertEqual([stock['symbol'] for stock in snapshot['gainers']], ['UPA', 'UPB'])
+        self.assertEqual(snapshot['losers'], [])
+
+    def test_fills_are_shared_between_instances(self):
+        worker_a = movers.MarketMovers()
+        worker_b = movers.MarketMovers()
+        worker_a.record_fill('AAPL', 5)
+        worker_a.record_fill('MSFT', 7)
+        worker_a.record_fill('AAPL', 3)
+        most_traded = worker_b.snapshot(5)['most_traded']
+        self.assertEqual([(stock['symbol'], stock['traded_shares']) for stock in most_traded], [('AAPL', 8), ('MSFT', 7)])
+
+    def test_ticks_from_price_feed_process_rerank(self):
+        market_movers = movers.MarketMovers()
+        mock_stocks.subscribe_ticks(market_movers.on_tick)
+        self.assertEqual(market_movers.snapshot(10)['losers'], [])
+
+        # The feed runs in its own process and shares ticks through shared memory
+        subprocess.run([sys.executable, '-c', (
+            "import mock_stocks; mock_stocks.publish_ticks(); "
+            "mock_stocks.apply_tick('MSFT', mock_stocks.get_stock('MSFT')['price'] * 0.9)"
+        )], cwd=ROOT, env=dict(os.environ, STOCKER_SHM_DIR=self.shm_dir), check=True)
+
+        losers = market_movers.snapshot(10)['losers']
+        self.assertEqual([stock['symbol'] for stock in losers], ['MSFT'])
+        self.assertLess(losers[0]['change_percent'], 0)
+        self.assertEqual(mock_stocks.get_tick_seq('MSFT'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,251 @@
+# Write-behind transaction log
+#
+# With TXLOG_WRITE_BEHIND enabled, trades don't wait on their own
+# transactions_table.put_item. Each record is appended to a per-worker journal
+# file and fsync'd (the trade is acknowledged only after that), then queued. A
+# background thread group-commits queued records with BatchWriteItem once
+# TXLOG_BATCH_SIZE records are waiting or the oldest has waited
+# TXLOG_FLUSH_INTERVAL_MS.
+#
+# Each journal is flock'd by the worker that owns it. Journals whose owner is
+# gone (crash, kill -9, OOM, gunicorn timeout) are replayed and deleted when the
+# app loads and again whenever gunicorn forks a worker, including the one that
+# replaces a killed worker, so preloaded masters don't wait for a restart.
+# Replays are idempotent: records are keyed by transaction_id.
+#
+# Records reach DynamoDB up to one flush interval after the trade returns, so
+# /api/transactions can briefly lag a just-completed trade.
+
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines: no cross-process journal locks
+    fcntl = None
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+TXLOG_DIR = os.getenv('TXLOG_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'txlog'))
+BATCH_SIZE = int(os.getenv('TXLOG_BATCH_SIZE', '25'))  # BatchWriteItem maximum
+FLUSH_INTERVAL_MS = int(os.getenv('TXLOG_FLUSH_INTERVAL_MS', '50'))
+# Rewrite the journal down to the unflushed records once it grows past this
+COMPACT_BYTES = 1024 * 1024
+RETRY_BACKOFF_SECONDS = 1.0
+
+_writers = []
+
+
+def _encode(value):
+    if isinstance(value, Decimal):
+        return {'__decimal__': str(value)}
+    raise TypeError(f"Cannot journal {type(value).__name__}")
+
+
+def _decode(obj):
+    if '__decimal__' in obj:
+        return Decimal(obj['__decimal__'])
+    return obj
+
+
+def _lock(f):
+    """Take the journal's exclusive lock without blocking; False if another process holds it"""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+
+def _read_journal(f):
+    records = []
+    for line in f.read().split(b'\n'):
+        if not line:
+            continue
+        try:
+            records.append(json.loads(line, object_hook=_decode))
+        except ValueError:
+            # Torn final append from a crash: the trade was never acknowledged
+            logger.warning("Skipping unreadable transaction journal entry")
+    return records
+
+
+def _batch_write(table, records):
+    with table.batch_writer(overwrite_by_pkeys=['transaction_id']) as batch:
+        for record in records:
+            batch.put_item(Item=record)
+
+
+def recover(table, journal_dir=TXLOG_DIR):
+    """Replay journals left behind by workers that exited before flushing; returns records replayed"""
+    replayed = 0
+    for path in glob.glob(os.path.join(journal_dir, 'txlog-*.jsonl')):
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            continue
+        with f:
+            if not _lock(f):
+                continue  # owned by a live worker
+            try:
+                if os.stat(path).st_ino != os.fstat(f.fileno()).st_ino:
+                    continue  # compacted since we opened it; path is now the owner's new journal
+            except FileNotFoundError:
+                continue
+            records = _read_journal(f)
+            if records:
+                try:
+                    _batch_write(table, records)
+                except Exception as e:
+                    # Runs in post_fork: never fail worker boot; the next fork retries
+                    logger.error("Replaying %s failed, leaving it for the next worker: %s", os.path.basename(path), e)
+                    metrics.incr('txlog.replay_errors')
+                    continue
+            os.unlink(path)
+        replayed += len(records)
+        logger.info("Replayed %d transaction records from %s", len(records), os.path.basename(path))
+    if replayed:
+        metrics.incr('txlog.replayed', replayed)
+    return replayed
+
+
+class TransactionLogWriter:
+    """Journal transaction records durably and group-commit them to DynamoDB"""
+
+    def __init__(self, table, journal_dir=TXLOG_DIR, batch_size=BATCH_SIZE,
+                 flush_interval_ms=FLUSH_INTERVAL_MS, fsync=True):
+        self.table = table
+        self.journal_dir = journal_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.fsync = fsync
+        self._cond = threading.Condition()
+        self._pid = None
+        self._pending = []
+        self._inflight = []
+        self._closed = False
+        _writers.append(self)
+
+    def submit(self, record):
+        """Durably journal one record and queue it; returns once it survives a crash"""
+        line = json.dumps(record, default=_encode).encode('utf-8') + b'\n'
+        with self._cond:
+            # Started lazily so a preloaded master forks workers without a shared journal or thread
+            if self._pid != os.getpid():
+                self._start()
+            self._journal.write(line)
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            self._pending.append(record)
+            self._cond.notify()
+
+    def close(self, timeout=10):
+        """Flush everything queued and remove the journal"""
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        with self._cond:
+            if not self._pending and not self._inflight:
+                os.unlink(self._journal_path)
+            self._journal.close()
+            self._pid = None
+
+    def _start(self):
+        os.makedirs(self.journal_dir, exist_ok=True)
+        self._journal_path = os.path.join(self.journal_dir, f"txlog-{os.getpid()}-{uuid.uuid4().hex[:8]}.jsonl")
+        # Lock under a name recover() doesn't match, then move it into place, so
+        # a booting worker can never find (and delete) an unlocked live journal
+        new_path = self._journal_path + '.new'
+        self._journal = open(new_path, 'ab')
+        _lock(self._journal)
+        os.replace(new_path, self._journal_path)
+        self._pending = []
+        self._inflight = []
+        self._closed = False
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='txlog-flusher', daemon=True)
+        self._thread.start()
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            # Size or time trigger: give the batch up to one interval to fill
+            deadline = time.monotonic() + self.flush_interval
+            while len(self._pending) < self.batch_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            self._inflight = self._pending[:self.batch_size]
+            self._pending = self._pending[self.batch_size:]
+            return self._inflight
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return  # closed and drained
+            started = time.perf_counter()
+            try:
+                _batch_write(self.table, batch)
+            except Exception as e:
+                logger.error("Transaction log flush failed, retrying: %s", e)
+                metrics.incr('txlog.flush_errors')
+                with self._cond:
+                    self._pending = batch + self._pending
+                    self._inflight = []
+                time.sleep(RETRY_BACKOFF_SECONDS)
+                continue
+
+            metrics.observe('txlog.batch_size', len(batch))
+            metrics.observe('txlog.flush_ms', (time.perf_counter() - started) * 1000)
+            with self._cond:
+                self._inflight = []
+                self._compact()
+
+    def _compact(self):
+        if not self._pending:
+            # Everything journaled is in DynamoDB
+            os.ftruncate(self._journal.fileno(), 0)
+            return
+        if os.fstat(self._journal.fileno()).st_size < COMPACT_BYTES:
+            return
+        # Under sustained load the queue never drains: rewrite the journal with
+        # only the unflushed records, locked before it replaces the old one.
+        compact_path = self._journal_path + '.compact'
+        compacted = open(compact_path, 'wb')
+        _lock(compacted)
+        for record in self._pending:
+            compacted.write(json.dumps(record, default=_encode).encode('utf-8') + b'\n')
+        compacted.flush()
+        os.fsync(compacted.fileno())
+        os.replace(compact_path, self._journal_path)
+        self._journal.close()
+        self._journal = compacted
+
+
+def recover_all():
+    """Replay orphaned journals for every writer in this process (gunicorn post_fork hook)"""
+    for writer in _writers:
+        recover(writer.table, writer.journal_dir)
+
+
+def close_all():
+    """Flush and close every writer in this process (gunicorn worker_exit hook)"""
+    for writer in _writers:
+        writer.close()
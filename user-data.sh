@@ -50,6 +50,20 @@ stdout_logfile=/var/log/stocker/gunicorn.log
 environment=PATH="/home/stocker/stocker-app/venv/bin",PYTHONUNBUFFERED=1
 EOF
 
+# Price feed: the single process that applies ticks and writes price history
+cat > /etc/supervisor/conf.d/stocker-price-feed.conf << 'EOF'
+[program:stocker-price-feed]
+directory=/home/stocker/stocker-app
+command=/home/stocker/stocker-app/venv/bin/flask --app app price-feed
+user=stocker
+autostart=true
+autorestart=true
+stopsignal=INT
+redirect_stderr=true
+stdout_logfile=/var/log/stocker/price-feed.log
+environment=PATH="/home/stocker/stocker-app/venv/bin",PYTHONUNBUFFERED=1
+EOF
+
 # Setup Nginx as reverse proxy
 rm -f /etc/nginx/sites-enabled/default
 cat > /etc/nginx/sites-available/stocker << 'EOF'
@@ -85,6 +99,9 @@ server {
         proxy_set_header X-Real-IP $remote_addr;
         proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
         proxy_set_header X-Forwarded-Proto $scheme;
+        # Request ID for app/access log correlation; queue start for admission control
+        proxy_set_header X-Request-ID $request_id;
+        proxy_set_header X-Request-Start "t=${msec}";
         proxy_redirect off;
         
         # Timeouts
@@ -156,7 +173,8 @@ NEXT STEPS:
 
 IMPORTANT:
 - EC2 instance must have IAM role with permissions for:
-  - DynamoDB: dynamodb:GetItem, dynamodb:PutItem, dynamodb:UpdateItem, dynamodb:Query
+  - DynamoDB: dynamodb:GetItem, dynamodb:BatchGetItem, dynamodb:PutItem, dynamodb:UpdateItem, dynamodb:DeleteItem, dynamodb:BatchWriteItem, dynamodb:Query
+    (plus dynamodb:Scan for running migrate_holdings.py)
   - SNS: sns:Publish
 - Do NOT commit .env file to git (add to .gitignore)
 - Application logs: /var/log/stocker/gunicorn.log